@@ -1,27 +1,104 @@
 # law_discovery.py (FINAL, COMPLETE, AND CORRECTED)
 
 import numpy as np
-import sympy as sp
 from typing import Dict, List, Tuple, Optional, Union
-from dataclasses import dataclass, field
 from fractions import Fraction
 from enum import Enum
+from collections import OrderedDict
 import itertools
+import heapq
+import contextlib
+import copy
+import hashlib
 import json
+import math
+import os
+import sys
+import time
 
-# --- Helper Classes (Unchanged) ---
+# SymPy is only needed for the optional 'sympy' / 'crosscheck' solver backends.
+try:
+    import sympy as sp
+except ImportError:
+    sp = None
+
+# --- Dimensions ---
+# Fixed order of the dimension tuples. New dimensions found in external
+# libraries are appended; tuples made earlier simply read as 0 for them.
+BASE_DIMENSIONS = ['L', 'M', 'T', 'Θ', 'Q', 'N']
+_DIMENSION_INDEX = {dim: i for i, dim in enumerate(BASE_DIMENSIONS)}
+
+def register_dimension(dim: str) -> int:
+    """Index of a base dimension in the dimension tuples, registering it if new."""
+    index = _DIMENSION_INDEX.get(dim)
+    if index is None:
+        index = _DIMENSION_INDEX[dim] = len(BASE_DIMENSIONS)
+        BASE_DIMENSIONS.append(dim)
+    return index
+
+def dimension_tuple(dimensions: Union[Dict[str, int], Tuple[int, ...]]) -> Tuple[int, ...]:
+    """
+    Canonical dimension tuple in BASE_DIMENSIONS order, with trailing zeros
+    trimmed. Raises ValueError for an exponent that is not an integer in the
+    int8 range, rather than truncating it.
+    """
+    if isinstance(dimensions, dict):
+        values = [0] * len(BASE_DIMENSIONS)
+        for dim, power in dimensions.items():
+            if power == 0: continue
+            index = register_dimension(dim)
+            if index >= len(values): values.extend([0] * (index + 1 - len(values)))
+            values[index] = power
+    else:
+        values = list(dimensions)
+    for i, power in enumerate(values):
+        try: integral = float(power).is_integer()
+        except (TypeError, ValueError): integral = False
+        if not integral:
+            raise ValueError(f"Dimension exponent {power!r} is not an integer; the dimension matrix only holds integer exponents.")
+        values[i] = power = int(power)
+        if not -128 <= power <= 127:
+            raise ValueError(f"Dimension exponent {power} does not fit the int8 dimension matrix.")
+    while values and values[-1] == 0: values.pop()
+    return tuple(values)
+
+# --- Helper Classes ---
 class UnitSystem(Enum):
     SI = "SI"
     CGS = "CGS"
     PLANCK = "Planck"
 
-@dataclass
 class PhysicalQuantity:
-    name: str
-    symbol: str
-    dimensions: Dict[str, int] = field(compare=False)
-    typical_values: Dict[str, float] = field(default_factory=dict, compare=False)
-    description: str = ""
+    """
+    One library entry. Dimensions are stored as a small-integer tuple in
+    BASE_DIMENSIONS order (dims) and names/symbols are interned, so tens of
+    thousands of entries stay cheap. The dimensions dict is built on demand.
+    """
+    __slots__ = ('name', 'symbol', 'dims', 'typical_values', 'description')
+
+    def __init__(self, name: str, symbol: str, dimensions: Union[Dict[str, int], Tuple[int, ...]], typical_values: Optional[Dict[str, float]] = None, description: str = ""):
+        self.name = sys.intern(name)
+        self.symbol = sys.intern(symbol)
+        self.dims = dimension_tuple(dimensions)
+        self.typical_values = typical_values or None
+        self.description = description
+
+    @classmethod
+    def _from_compiled(cls, name: str, symbol: str, dims: Tuple[int, ...], typical_values: Optional[Dict[str, float]], description: str) -> 'PhysicalQuantity':
+        """Fast path for precompiled libraries: dims is already a trimmed int8-range tuple."""
+        quantity = cls.__new__(cls)
+        quantity.name, quantity.symbol, quantity.dims = sys.intern(name), sys.intern(symbol), dims
+        quantity.typical_values, quantity.description = typical_values or None, description
+        return quantity
+
+    @property
+    def dimensions(self) -> Dict[str, int]:
+        return {BASE_DIMENSIONS[i]: power for i, power in enumerate(self.dims) if power != 0}
+
+    def exponent(self, dim: str) -> int:
+        index = _DIMENSION_INDEX.get(dim)
+        return self.dims[index] if index is not None and index < len(self.dims) else 0
+
     def __repr__(self):
         dim_str = " ".join([f"{dim}^{exp}" if exp != 1 else dim 
                            for dim, exp in self.dimensions.items() if exp != 0])
@@ -32,30 +109,875 @@ class PhysicalQuantity:
     def __hash__(self):
         return hash(self.name)
 
+# --- Quantity Library ---
+class QuantityLibrary(dict):
+    """
+    name -> PhysicalQuantity mapping that also keeps a contiguous int8 matrix
+    (quantities × BASE_DIMENSIONS, rows in insertion order) and a hash index
+    from exact dimension vector to names. Every insert/remove goes through
+    __setitem__/__delitem__, so the arrays never drift from the dict.
+    """
+    def __init__(self, quantities: Optional[Dict[str, PhysicalQuantity]] = None):
+        super().__init__()
+        self._matrix = np.zeros((max(len(quantities or ()), 16), len(BASE_DIMENSIONS)), dtype=np.int8)
+        self._names = []
+        self._rows = {}
+        self._by_vector = {}
+        self.version = 0
+        if quantities: self.update(quantities)
+
+    @classmethod
+    def from_arrays(cls, quantities: List[PhysicalQuantity], matrix: np.ndarray) -> 'QuantityLibrary':
+        """
+        Bulk constructor for precompiled libraries: matrix[i] must be
+        quantities[i]'s dimension row. A C-contiguous int8 matrix (such as the
+        memory map of a .qlib file) is used as is, not copied; it is copied on
+        the first write, or when new dimensions widen it.
+        """
+        library = cls()
+        if isinstance(matrix, np.ndarray) and matrix.dtype == np.int8 and matrix.ndim == 2 and matrix.shape[0] == len(quantities) and matrix.flags.c_contiguous:
+            library._matrix = matrix
+        else:
+            library._matrix = np.array(matrix, dtype=np.int8, order='C').reshape(len(quantities), -1)
+        library._widen()
+        names = [q.name for q in quantities]
+        if len(set(names)) != len(names): raise ValueError("Duplicate quantity names in library.")
+        dict.update(library, zip(names, quantities))
+        library._names, library._rows = names, {name: i for i, name in enumerate(names)}
+        data, width = library._matrix.tobytes(), library._matrix.shape[1]
+        for i, name in enumerate(names):
+            library._by_vector.setdefault(data[i * width:(i + 1) * width], []).append(name)
+        library.version += 1
+        return library
+
+    @property
+    def dimension_names(self) -> List[str]:
+        return BASE_DIMENSIONS[:self._matrix.shape[1]]
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Read-only view of the live rows."""
+        view = self._matrix[:len(self._names)]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def name_at(self, index: int) -> str:
+        """Name of matrix row index, without copying the name table as names does."""
+        return self._names[index]
+
+    def vector(self, dimensions: Dict[str, int]) -> Optional[np.ndarray]:
+        """Dimension dict as a row vector, or None if it uses a dimension the library has never seen."""
+        vec = np.zeros(self._matrix.shape[1], dtype=np.int8)
+        for dim, power in dimensions.items():
+            if power == 0: continue
+            index = _DIMENSION_INDEX.get(dim)
+            if index is None or index >= len(vec): return None
+            vec[index] = power
+        return vec
+
+    def row(self, name: str) -> np.ndarray:
+        return self._matrix[self._rows[name]]
+
+    def index_of(self, name: str) -> int:
+        return self._rows[name]
+
+    def lookup(self, dimensions: Dict[str, int]) -> List[str]:
+        """Names of all quantities with exactly these dimensions (hash lookup, no scan)."""
+        vec = self.vector(dimensions)
+        return list(self._by_vector.get(vec.tobytes(), ())) if vec is not None else []
+
+    def _widen(self):
+        """Adds matrix columns for dimensions registered since the matrix was built."""
+        missing = len(BASE_DIMENSIONS) - self._matrix.shape[1]
+        if missing <= 0: return
+        self._matrix = np.hstack([self._matrix, np.zeros((self._matrix.shape[0], missing), dtype=np.int8)])
+        self._by_vector = {self._matrix[self._rows[names[0]]].tobytes(): names for names in self._by_vector.values()}
+
+    def _encode(self, quantity: PhysicalQuantity) -> np.ndarray:
+        self._widen()
+        vec = np.zeros(self._matrix.shape[1], dtype=np.int8)
+        vec[:len(quantity.dims)] = quantity.dims
+        return vec
+
+    def _make_writable(self):
+        """Copies a read-only (memory-mapped) matrix before the first in-place write."""
+        if not self._matrix.flags.writeable: self._matrix = np.array(self._matrix)
+
+    def _unindex(self, name: str):
+        key = self._matrix[self._rows[name]].tobytes()
+        bucket = self._by_vector[key]
+        bucket.remove(name)
+        if not bucket: del self._by_vector[key]
+
+    def __setitem__(self, name: str, quantity: PhysicalQuantity):
+        vec = self._encode(quantity)
+        self._make_writable()
+        if name in self._rows:
+            self._unindex(name)
+            row = self._rows[name]
+        else:
+            row = len(self._names)
+            if row == self._matrix.shape[0]:
+                self._matrix = np.vstack([self._matrix, np.zeros_like(self._matrix)])
+            self._names.append(name)
+            self._rows[name] = row
+        self._matrix[row] = vec
+        self._by_vector.setdefault(vec.tobytes(), []).append(name)
+        super().__setitem__(name, quantity)
+        self.version += 1
+
+    def __delitem__(self, name: str):
+        super().__delitem__(name)
+        self._unindex(name)
+        self._make_writable()
+        row, count = self._rows.pop(name), len(self._names)
+        self._matrix[row:count - 1] = self._matrix[row + 1:count]
+        self._matrix[count - 1] = 0
+        del self._names[row]
+        for shifted in self._names[row:]: self._rows[shifted] -= 1
+        self.version += 1
+
+    def pop(self, name: str, *default):
+        if name not in self:
+            if default: return default[0]
+            raise KeyError(name)
+        quantity = self[name]
+        del self[name]
+        return quantity
+
+    def popitem(self):
+        if not self._names: raise KeyError('popitem(): library is empty')
+        name = self._names[-1]
+        return name, self.pop(name)
+
+    def setdefault(self, name: str, quantity: PhysicalQuantity = None):
+        if name not in self: self[name] = quantity
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, quantity in dict(*args, **kwargs).items(): self[name] = quantity
+
+    def clear(self):
+        super().clear()
+        self._make_writable()
+        self._matrix[:] = 0
+        self._names, self._rows, self._by_vector = [], {}, {}
+        self.version += 1
+
+# --- Library Files ---
+# Authoring formats are JSON and CSV. '.qlib' is the precompiled binary form:
+# magic, header length (uint64 LE), JSON header (dimension order, names,
+# symbols, descriptions, typical values), padding to 8 bytes, then the raw
+# int8 quantities × dimensions matrix, which is memory-mapped on load.
+LIBRARY_MAGIC = b'LDQLIB1\n'
+_CSV_FIELDS = ('name', 'symbol', 'description')
+
+def _quantity_from_record(record: Dict) -> PhysicalQuantity:
+    return PhysicalQuantity(record['name'], record.get('symbol') or record['name'], record.get('dimensions') or {},
+                            typical_values=record.get('typical_values'), description=record.get('description', ""))
+
+def _quantity_to_record(quantity: PhysicalQuantity) -> Dict:
+    record = {'name': quantity.name, 'symbol': quantity.symbol, 'dimensions': quantity.dimensions, 'description': quantity.description}
+    if quantity.typical_values: record['typical_values'] = quantity.typical_values
+    return record
+
+def load_quantity_library(path: str) -> QuantityLibrary:
+    """Loads a library file; the format is chosen by extension (.json, .csv or .qlib)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.qlib': return _load_binary_library(path)
+    if extension == '.json':
+        with open(path, encoding='utf-8') as f: data = json.load(f)
+        if isinstance(data, dict):
+            data = data['quantities'] if 'quantities' in data else [dict(record, name=name) for name, record in data.items()]
+        return QuantityLibrary({q.name: q for q in map(_quantity_from_record, data)})
+    if extension == '.csv':
+        import csv
+        library = QuantityLibrary()
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                dims = {k: float(v) for k, v in row.items() if k not in _CSV_FIELDS and not k.startswith('value:') and v and v.strip()}
+                values = {k[len('value:'):]: float(v) for k, v in row.items() if k.startswith('value:') and v and v.strip()}
+                q = PhysicalQuantity(row['name'], row.get('symbol') or row['name'], dims, typical_values=values, description=row.get('description') or "")
+                library[q.name] = q
+        return library
+    raise ValueError(f"Unsupported library format '{extension}' (expected .json, .csv or .qlib).")
+
+def save_quantity_library(library: Dict[str, PhysicalQuantity], path: str):
+    """Writes a library as .json, .csv or precompiled .qlib (chosen by extension)."""
+    extension = os.path.splitext(path)[1].lower()
+    quantities = list(library.values())
+    if extension == '.json':
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'quantities': [_quantity_to_record(q) for q in quantities]}, f, ensure_ascii=False, indent=1)
+    elif extension == '.csv':
+        import csv
+        units = sorted({unit for q in quantities for unit in (q.typical_values or {})})
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(list(_CSV_FIELDS) + BASE_DIMENSIONS + [f"value:{unit}" for unit in units])
+            for q in quantities:
+                values = q.typical_values or {}
+                writer.writerow([q.name, q.symbol, q.description] + [q.exponent(dim) or '' for dim in BASE_DIMENSIONS] + [values.get(unit, '') for unit in units])
+    elif extension == '.qlib':
+        matrix = _dimension_matrix(quantities)
+        header = json.dumps({'dimensions': BASE_DIMENSIONS, 'names': [q.name for q in quantities], 'symbols': [q.symbol for q in quantities],
+                             'descriptions': [q.description for q in quantities],
+                             'typical_values': {q.name: q.typical_values for q in quantities if q.typical_values}}, ensure_ascii=False).encode('utf-8')
+        header += b' ' * (-(len(LIBRARY_MAGIC) + 8 + len(header)) % 8)
+        with open(path, 'wb') as f:
+            f.write(LIBRARY_MAGIC + len(header).to_bytes(8, 'little') + header)
+            f.write(matrix.tobytes())
+    else:
+        raise ValueError(f"Unsupported library format '{extension}' (expected .json, .csv or .qlib).")
+
+def _load_binary_library(path: str) -> QuantityLibrary:
+    with open(path, 'rb') as f:
+        if f.read(len(LIBRARY_MAGIC)) != LIBRARY_MAGIC: raise ValueError(f"'{path}' is not a compiled quantity library.")
+        header_len = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    names, dims = header['names'], header['dimensions']
+    offset = len(LIBRARY_MAGIC) + 8 + header_len
+    stored = np.memmap(path, dtype=np.int8, mode='r', offset=offset, shape=(len(names), len(dims))) if names else np.zeros((0, len(dims)), dtype=np.int8)
+    columns = [register_dimension(dim) for dim in dims]
+    if columns == list(range(len(dims))):
+        matrix = stored
+    else:
+        matrix = np.zeros((len(names), len(BASE_DIMENSIONS)), dtype=np.int8)
+        matrix[:, columns] = stored
+    values = header.get('typical_values', {})
+    nonzero = matrix != 0
+    lengths = np.where(nonzero.any(axis=1), matrix.shape[1] - np.argmax(nonzero[:, ::-1], axis=1), 0).tolist()
+    quantities = [PhysicalQuantity._from_compiled(name, symbol, tuple(row[:length]), values.get(name), description)
+                  for name, symbol, description, row, length in zip(names, header['symbols'], header['descriptions'], matrix.tolist(), lengths)]
+    return QuantityLibrary.from_arrays(quantities, matrix)
+
+def merge_quantity_libraries(*libraries: Dict[str, PhysicalQuantity], on_conflict: str = 'override') -> QuantityLibrary:
+    """
+    Merges libraries left to right. A name defined twice is resolved by
+    on_conflict: 'override' (later wins), 'keep' (first wins) or 'error'.
+    The result is built in bulk around the largest library: its names come
+    first, in its order, followed by the names new in the others. If that
+    library is a QuantityLibrary and the merge adds no names or dimensions
+    to it, its read-only matrix (a .qlib memory map) is shared, not copied.
+    """
+    if on_conflict not in ('override', 'keep', 'error'):
+        raise ValueError(f"Unknown on_conflict policy '{on_conflict}'.")
+    winners = {}
+    for library in libraries:
+        for name, quantity in library.items():
+            if name in winners:
+                if on_conflict == 'error': raise ValueError(f"Quantity '{name}' is defined in more than one library.")
+                if on_conflict == 'keep': continue
+            winners[name] = quantity
+    if not winners: return QuantityLibrary()
+    base = max(libraries, key=len)
+    names = list(dict.fromkeys(itertools.chain(base, *(library for library in libraries if library is not base))))
+    quantities = [winners[name] for name in names]
+    if isinstance(base, QuantityLibrary) and len(names) == len(base) and all(winners[name].dims == quantity.dims for name, quantity in base.items()):
+        matrix = base._matrix[:len(base)]
+        # A read-only map is copied on its first write anyway; a live matrix must not be shared between two libraries.
+        return QuantityLibrary.from_arrays(quantities, matrix.copy() if matrix.flags.writeable else matrix)
+    return QuantityLibrary.from_arrays(quantities, _dimension_matrix(quantities))
+
+def _dimension_matrix(quantities: List[PhysicalQuantity]) -> np.ndarray:
+    """int8 quantities × BASE_DIMENSIONS matrix of the quantities' dimension tuples."""
+    matrix = np.zeros((len(quantities), len(BASE_DIMENSIONS)), dtype=np.int8)
+    for i, q in enumerate(quantities): matrix[i, :len(q.dims)] = q.dims
+    return matrix
+
+# --- Measurement Data ---
+FIT_CHUNK_ROWS = 1_000_000
+
+def _iter_measurement_chunks(source, names: List[str], columns: Optional[List[str]] = None, chunk_rows: int = FIT_CHUNK_ROWS):
+    """
+    Streams the named columns of a measurement dataset as float64 blocks of
+    shape (rows, len(names)), at most chunk_rows rows each. Supported sources:
+    - a dict of 1-D arrays;
+    - a structured array (field names);
+    - a 2-D array whose columns are named by columns;
+    - a path to a .npy file (memory-mapped, never loaded whole);
+    - a path to a .csv file with a header row (or columns), parsed chunk by
+      chunk with np.loadtxt.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.lower().endswith('.npy'):
+            source = np.load(path, mmap_mode='r')
+        elif path.lower().endswith('.csv'):
+            yield from _iter_csv_chunks(path, names, columns, chunk_rows)
+            return
+        else:
+            raise ValueError(f"Unsupported measurement file '{path}'. Use .csv or .npy.")
+    if isinstance(source, dict):
+        missing = [name for name in names if name not in source]
+        if missing: raise ValueError(f"Data has no column for: {', '.join(missing)}.")
+        arrays = [np.asarray(source[name]) for name in names]
+    elif isinstance(source, np.ndarray) and source.dtype.names:
+        missing = [name for name in names if name not in source.dtype.names]
+        if missing: raise ValueError(f"Data has no column for: {', '.join(missing)}.")
+        arrays = [source[name] for name in names]
+    elif isinstance(source, np.ndarray) and source.ndim == 2:
+        if columns is None or len(columns) != source.shape[1]:
+            raise ValueError("A 2-D array needs a columns list naming each of its columns.")
+        missing = [name for name in names if name not in columns]
+        if missing: raise ValueError(f"Data has no column for: {', '.join(missing)}.")
+        arrays = [source[:, columns.index(name)] for name in names]
+    else:
+        raise ValueError("Measurement data must be a dict of arrays, a structured or 2-D array, or a .csv/.npy path.")
+    n_rows = len(arrays[0]) if arrays else 0
+    if any(len(array) != n_rows for array in arrays): raise ValueError("Data columns have different lengths.")
+    for start in range(0, n_rows, chunk_rows):
+        yield np.column_stack([np.asarray(array[start:start + chunk_rows], dtype=float) for array in arrays])
+
+def _measurement_columns(source, columns: Optional[List[str]] = None) -> List[str]:
+    """Column names of a measurement dataset accepted by _iter_measurement_chunks (for a .csv, its header row)."""
+    if columns is not None: return list(columns)
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.lower().endswith('.csv'):
+            import csv
+            with open(path, newline='', encoding='utf-8') as f:
+                return [name.strip() for name in next(csv.reader([f.readline()]))]
+        if path.lower().endswith('.npy'):
+            source = np.load(path, mmap_mode='r')
+    if isinstance(source, dict): return list(source)
+    if isinstance(source, np.ndarray) and source.dtype.names: return list(source.dtype.names)
+    raise ValueError("Name the data columns with columns.")
+
+class RunningStats:
+    """
+    Count, mean, variance, min and max of a stream of value blocks. Each block
+    is reduced with NumPy and merged with the parallel form of Welford's update
+    (Chan et al.), so memory stays constant and there is no per-value loop.
+    """
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.n, self.mean, self.m2, self.min, self.max = 0, 0.0, 0.0, math.inf, -math.inf
+
+    def update(self, values: np.ndarray):
+        n_b = len(values)
+        if not n_b: return
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        self.min, self.max = min(self.min, float(values.min())), max(self.max, float(values.max()))
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.n if self.n else math.nan
+
+def _iter_csv_chunks(path: str, names: List[str], columns: Optional[List[str]], chunk_rows: int):
+    import csv, warnings
+    with open(path, newline='', encoding='utf-8') as f:
+        header = columns or [name.strip() for name in next(csv.reader([f.readline()]))]
+        missing = [name for name in names if name not in header]
+        if missing: raise ValueError(f"'{path}' has no column for: {', '.join(missing)}.")
+        usecols = [header.index(name) for name in names]
+        while True:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # an exactly consumed file reads one empty block
+                block = np.loadtxt(f, delimiter=',', usecols=usecols, max_rows=chunk_rows, ndmin=2, dtype=float)
+            if len(block): yield block
+            if len(block) < chunk_rows: break
+
+# --- Exact Rational Solver ---
+def exact_rref(rows: List[List[int]]) -> Tuple[List[List[Fraction]], List[int]]:
+    """
+    Reduced row echelon form over the rationals. Elimination is fraction-free:
+    rows stay as primitive integer vectors (cross-multiplied, common factor
+    removed) and only the final pivot rows are scaled into Fractions, so ranks
+    and solutions are exact. Returns the reduced rows and the pivot column of
+    each non-zero row.
+    """
+    matrix, pivots = _integer_echelon(rows)
+    n_rows, n_cols, r = len(matrix), (len(matrix[0]) if matrix else 0), len(pivots)
+    result = [[Fraction(v, row[c]) for v in row] for row, c in zip(matrix, pivots)]
+    result.extend([Fraction(0)] * n_cols for _ in range(n_rows - r))
+    return result, pivots
+
+def _integer_row(row: List) -> List[int]:
+    """A row as integers; rational entries (e.g. half-integer exponents) scale the row by their common denominator, which keeps it exact."""
+    ints = [int(v) for v in row]
+    if all(i == v for i, v in zip(ints, row)): return ints
+    fractions = [Fraction(v) for v in row]
+    scale = math.lcm(*(f.denominator for f in fractions))
+    return [int(f * scale) for f in fractions]
+
+def _integer_echelon(rows: List[List[int]]) -> Tuple[List[List[int]], List[int]]:
+    """Fraction-free Gauss-Jordan pass of exact_rref: primitive integer rows and the pivot columns."""
+    matrix = [_integer_row(row) for row in rows]
+    n_rows, n_cols = len(matrix), (len(matrix[0]) if matrix else 0)
+    pivots, r = [], 0
+    for c in range(n_cols):
+        if r == n_rows: break
+        pivot_row = next((i for i in range(r, n_rows) if matrix[i][c] != 0), None)
+        if pivot_row is None: continue
+        matrix[r], matrix[pivot_row] = matrix[pivot_row], matrix[r]
+        prow, pivot_val = matrix[r], matrix[r][c]
+        for i in range(n_rows):
+            factor = matrix[i][c]
+            if i != r and factor != 0:
+                reduced = [pivot_val * a - factor * p for a, p in zip(matrix[i], prow)]
+                g = math.gcd(*reduced)
+                matrix[i] = [v // g for v in reduced] if g > 1 else reduced
+        pivots.append(c)
+        r += 1
+    return matrix, pivots
+
+def exact_solve(A_rows: List[List[int]], b: List[int]) -> Tuple[int, Optional[int], Optional[List[Fraction]]]:
+    """
+    Single elimination pass over the augmented system [A | b].
+    Returns (rank_A, failing_row, solution): failing_row is the original row
+    (dimension) to blame when the system is inconsistent, see conflicting_row
+    (None when consistent), and solution is the unique exact solution (None
+    unless consistent and full rank).
+    """
+    num_inputs = len(A_rows[0]) if A_rows else 0
+    rref_aug, pivots = exact_rref([list(row) + [rhs] for row, rhs in zip(A_rows, b)])
+    rank_A = sum(1 for c in pivots if c < num_inputs)
+    if len(pivots) > rank_A: return rank_A, conflicting_row(A_rows, b), None
+    if rank_A < num_inputs: return rank_A, None, None
+    return rank_A, None, [rref_aug[i][num_inputs] for i in range(num_inputs)]
+
+def is_consistent(A_rows: List[List[int]], b: List[int]) -> bool:
+    """True when A·x = b has a rational solution (no pivot lands in the b column)."""
+    num_inputs = len(A_rows[0]) if A_rows else 0
+    _, pivots = _integer_echelon([list(row) + [rhs] for row, rhs in zip(A_rows, b)])
+    return all(c < num_inputs for c in pivots)
+
+def conflicting_row(A_rows: List[List[int]], b: List[int]) -> int:
+    """
+    Original row of an inconsistent system A·x = b to report as failing: the
+    first row whose removal makes the others consistent. When no single row
+    does, the first row that is inconsistent with the rows before it.
+    """
+    rows = list(zip(A_rows, b))
+    for i in range(len(rows)):
+        rest = rows[:i] + rows[i + 1:]
+        if is_consistent([r for r, _ in rest], [v for _, v in rest]): return i
+    return next(i for i in range(len(rows)) if not is_consistent(A_rows[:i + 1], b[:i + 1]))
+
+# Largest entry exact_ranks keeps in int64: the product of two stays below 2**61.
+_EXACT_RANK_LIMIT = 2 ** 30
+
+def exact_ranks(stack: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact ranks of a stack of integer matrices (count × rows × columns): the
+    fraction-free elimination of _integer_echelon, run on the whole stack at
+    once in int64, with each row divided by its gcd after every step.
+    Returns (ranks, ok); ok is False for a matrix whose entries grew past
+    _EXACT_RANK_LIMIT, which has to be ranked with the Python solver instead.
+    """
+    matrix = np.array(stack, dtype=np.int64)
+    count, n_rows, n_cols = matrix.shape
+    ranks = np.zeros(count, dtype=np.int64)
+    ok = np.abs(matrix).max(axis=(1, 2), initial=0) <= _EXACT_RANK_LIMIT
+    row_index = np.arange(n_rows)
+    for c in range(n_cols):
+        candidates = (matrix[:, :, c] != 0) & (row_index >= ranks[:, None])
+        active = np.flatnonzero(candidates.any(axis=1) & ok)
+        if not len(active): continue
+        k, r, p = np.arange(len(active)), ranks[active], candidates[active].argmax(axis=1)
+        sub = matrix[active]
+        sub[k, r], sub[k, p] = sub[k, p], sub[k, r]
+        prow = sub[k, r]
+        reduced = prow[:, c, None, None] * sub - sub[:, :, c, None] * prow[:, None, :]
+        sub = np.where((row_index > r[:, None])[:, :, None], reduced, sub)
+        g = np.gcd.reduce(sub, axis=2)
+        sub //= np.where(g == 0, 1, g)[:, :, None]
+        matrix[active] = sub
+        ranks[active] += 1
+        ok[active] &= np.abs(sub).max(axis=(1, 2)) <= _EXACT_RANK_LIMIT
+    return ranks, ok
+
+def exact_solve_many(systems: List[Tuple[List[List[int]], List[int]]]) -> List[Tuple[int, Optional[int], Optional[List[Fraction]]]]:
+    """
+    exact_solve for many systems (A_rows, b), with the same results. Systems
+    of the same shape are stacked and classified with exact_ranks: the ranks
+    of A and [A | b], and for an inconsistent system the same ranks with
+    each row removed in turn, then of each prefix of rows, which is
+    conflicting_row. Only systems with a
+    unique solution, and the rare ones exact_ranks cannot settle, go through
+    exact_solve one at a time.
+    """
+    results = [None] * len(systems)
+    by_shape = {}
+    for i, (A_rows, b) in enumerate(systems):
+        by_shape.setdefault((len(b), len(A_rows[0]) if A_rows else 0), []).append(i)
+    for (n_rows, n_inputs), members in by_shape.items():
+        aug = np.array([[list(row) + [rhs] for row, rhs in zip(*systems[i])] for i in members], dtype=np.int64).reshape(len(members), n_rows, n_inputs + 1)
+        rank_A, ok_A = exact_ranks(aug[:, :, :n_inputs])
+        rank_aug, ok_aug = exact_ranks(aug)
+        ok = ok_A & ok_aug
+        inconsistent = ok & (rank_aug > rank_A)
+        # -1: no row found yet; -2: left to conflicting_row.
+        failing = np.where(inconsistent, -1, -2)
+        for row in range(n_rows):
+            undecided = np.flatnonzero(failing == -1)
+            if not len(undecided): break
+            rest = np.delete(aug[undecided], row, axis=1)
+            rest_A, rest_ok_A = exact_ranks(rest[:, :, :n_inputs])
+            rest_aug, rest_ok_aug = exact_ranks(rest)
+            failing[undecided[~(rest_ok_A & rest_ok_aug)]] = -2
+            failing[undecided[rest_ok_A & rest_ok_aug & (rest_A == rest_aug)]] = row
+        for row in range(n_rows):
+            undecided = np.flatnonzero(failing == -1)
+            if not len(undecided): break
+            prefix = aug[undecided, :row + 1]
+            prefix_A, prefix_ok_A = exact_ranks(prefix[:, :, :n_inputs])
+            prefix_aug, prefix_ok_aug = exact_ranks(prefix)
+            failing[undecided[~(prefix_ok_A & prefix_ok_aug)]] = -2
+            failing[undecided[prefix_ok_A & prefix_ok_aug & (prefix_aug > prefix_A)]] = row
+        for j, i in enumerate(members):
+            if inconsistent[j] and failing[j] >= 0: results[i] = (int(rank_A[j]), int(failing[j]), None)
+            elif ok[j] and not inconsistent[j] and rank_A[j] < n_inputs: results[i] = (int(rank_A[j]), None, None)
+            else: results[i] = exact_solve(*systems[i])
+    return results
+
+def integer_null_space(rows: List[List[int]]) -> List[List[int]]:
+    """
+    Basis of the lattice of all integer vectors x with rows·x = 0. The
+    transposed matrix is augmented with the identity, [Aᵀ | I], and brought to
+    echelon form with unimodular integer row operations (Euclid on each
+    column). The identity part of the rows whose Aᵀ part is zero is the
+    basis. Because the transform is unimodular, every integer solution is an
+    integer combination of it, which one vector per free RREF column does not
+    guarantee once a pivot is not ±1.
+    """
+    n_dims, n_cols = len(rows), (len(rows[0]) if rows else 0)
+    work = [[rows[d][j] for d in range(n_dims)] + [int(i == j) for i in range(n_cols)] for j in range(n_cols)]
+    r = 0
+    for c in range(n_dims):
+        while r < n_cols:
+            nonzero = [i for i in range(r, n_cols) if work[i][c] != 0]
+            if not nonzero: break
+            pivot = min(nonzero, key=lambda i: abs(work[i][c]))
+            work[r], work[pivot] = work[pivot], work[r]
+            prow = work[r]
+            for i in range(r + 1, n_cols):
+                if work[i][c] != 0:
+                    q = work[i][c] // prow[c]
+                    work[i] = [a - q * p for a, p in zip(work[i], prow)]
+            if all(work[i][c] == 0 for i in range(r + 1, n_cols)):
+                r += 1
+                break
+    return [row[n_dims:] for row in work[r:]]
+
+def lll_reduce(basis: List[List[int]], delta: float = 0.75) -> List[List[int]]:
+    """
+    LLL lattice reduction: returns a basis of the same integer lattice made of
+    short, nearly orthogonal vectors (small, readable exponents). The basis is
+    updated with exact integer operations. Gram-Schmidt runs in floating point
+    through a QR decomposition, which is plenty for the tiny exponent
+    vectors of a dimension matrix.
+    """
+    b = [list(v) for v in basis]
+    n = len(b)
+    if n < 2: return b
+
+    def gram_schmidt():
+        r = np.linalg.qr(np.array(b, dtype=float).T, mode='r')
+        diag = np.diag(r)
+        return r.T / diag, diag ** 2   # mu[i][j] = <b_i, b*_j> / |b*_j|², B[j] = |b*_j|²
+
+    mu, B = gram_schmidt()
+    k = 1
+    while k < n:
+        for j in range(k - 1, -1, -1):
+            q = int(round(mu[k, j]))
+            if q:
+                b[k] = [x - q * y for x, y in zip(b[k], b[j])]
+                mu[k, :j + 1] -= q * mu[j, :j + 1]
+        if B[k] >= (delta - mu[k, k - 1] ** 2) * B[k - 1]:
+            k += 1
+        else:
+            b[k], b[k - 1] = b[k - 1], b[k]
+            mu, B = gram_schmidt()
+            k = max(k - 1, 1)
+    return b
+
+class IncrementalEchelon:
+    """
+    Exact echelon basis of a column space that grows one column at a time.
+    Basis vectors are primitive integer vectors, each zero at the pivots of
+    the vectors before it. Reducing a new column is therefore one
+    fraction-free pass over the basis (O(rank·rows)) instead of a fresh
+    elimination. Instances are immutable; add() returns a new echelon and
+    leaves this one unchanged, so search states can share them.
+    """
+    __slots__ = ('basis',)
+
+    def __init__(self, basis: Tuple[Tuple[int, Tuple[int, ...]], ...] = ()):
+        self.basis = basis
+
+    @property
+    def rank(self) -> int:
+        return len(self.basis)
+
+    def reduce(self, vector) -> List[int]:
+        residual = [int(v) for v in vector]
+        for pivot, basis_vec in self.basis:
+            factor = residual[pivot]
+            if factor != 0:
+                scale = basis_vec[pivot]
+                residual = [scale * r - factor * bv for r, bv in zip(residual, basis_vec)]
+                g = math.gcd(*residual)
+                if g > 1: residual = [r // g for r in residual]
+        return residual
+
+    def spans(self, vector) -> bool:
+        return not any(self.reduce(vector))
+
+    def add(self, vector) -> Optional['IncrementalEchelon']:
+        """Echelon with the column added, or None if it does not raise the rank."""
+        residual = self.reduce(vector)
+        pivot = next((i for i, v in enumerate(residual) if v != 0), None)
+        if pivot is None: return None
+        return IncrementalEchelon(self.basis + ((pivot, tuple(residual)),))
+
+# --- Result Cache ---
+class LRUCache:
+    """Small least-recently-used cache with hit/miss/eviction counters. maxsize=0 disables it."""
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0: return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def info(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._data), 'maxsize': self.maxsize}
+
+# --- Profiling ---
+class DiscoveryProfile:
+    """
+    Stage timings and counters for one profiled discovery. A stage records
+    inclusive wall-clock seconds and the number of entries. Nested work is
+    counted in every enclosing stage, e.g. the solves inside auto_search also
+    appear under 'solve'.
+    """
+    __slots__ = ('stages', 'counters', 'started')
+
+    def __init__(self):
+        self.stages, self.counters, self.started = {}, {}, time.perf_counter()
+
+    def stage(self, name: str) -> '_ProfileStage':
+        return _ProfileStage(self.stages, name)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> Dict:
+        return {'total': time.perf_counter() - self.started,
+                'stages': {name: {'time': spent, 'calls': calls} for name, (spent, calls) in self.stages.items()},
+                'counters': dict(self.counters)}
+
+class _ProfileStage:
+    __slots__ = ('stages', 'name', 'start')
+
+    def __init__(self, stages: Dict, name: str):
+        self.stages, self.name = stages, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        spent, calls = self.stages.get(self.name, (0.0, 0))
+        self.stages[self.name] = (spent + time.perf_counter() - self.start, calls + 1)
+        return False
+
+class _NullProfile:
+    """Stands in for DiscoveryProfile while profiling is off; every hook is a no-op."""
+    __slots__ = ()
+
+    def stage(self, name: str) -> '_NullProfile':
+        return self
+
+    def count(self, name: str, n: int = 1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_PROFILE = _NullProfile()
+
+class EngineMetrics:
+    """Running totals over every profiled discovery of an engine: calls, outcomes, time, per-stage time and calls, counters."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = self.successes = 0
+        self.total = 0.0
+        self.stages, self.counters = {}, {}
+
+    def add(self, report: Dict):
+        self.calls += 1
+        self.successes += bool(report.get('success'))
+        self.total += report['total']
+        for name, stage in report['stages'].items():
+            totals = self.stages.setdefault(name, {'time': 0.0, 'calls': 0})
+            totals['time'] += stage['time']
+            totals['calls'] += stage['calls']
+        for name, n in report['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> Dict:
+        return {'calls': self.calls, 'successes': self.successes, 'total': self.total,
+                'stages': {name: dict(stage) for name, stage in self.stages.items()}, 'counters': dict(self.counters)}
+
 # --- Main Engine Class ---
 class EnhancedPhysicsDisentangler:
     """
     Final working version with synchronous initialization and robust solver for Pyodide.
+
+    solver_backend selects how solve_and_diagnose does its linear algebra:
+    'exact' (default, built-in rational elimination, no SymPy needed),
+    'sympy' (the original symbolic path) or 'crosscheck' (exact, verified
+    against SymPy on every call).
+
+    Solver results are kept in an LRU cache of cache_size entries, keyed on the
+    canonical signature of the dimension matrix (see dimension_signature).
+    Names, symbols and suggestions are applied after the lookup, so every
+    alias with the same dimensional shape shares one entry. Π-group bases
+    share the signature key, and suggestion rankings are cached per set of
+    missing dimensions, each in an LRU cache of the same size.
+
+    With profiling=True (or profile=True on a single discover_relationship
+    call), each result gets a 'profile' entry:
+    - per-stage times and calls: matrix, solve, suggestions, format,
+      validate, pi_groups, auto_search;
+    - counters, such as search nodes;
+    - solver cache activity during the call.
+    Every report is also added to self.metrics (an EngineMetrics) and passed
+    to each callable in self.metrics_hooks, e.g. an exporter to an external
+    metrics system. While profiling is off, the hooks are no-ops.
     """
+    SOLVER_BACKENDS = ('exact', 'sympy', 'crosscheck')
     
-    def __init__(self, unit_system: UnitSystem = UnitSystem.SI):
+    SEARCH_LIMITS = {'max_depth': 4, 'max_nodes': 2000, 'time_budget': 5.0, 'top_k': 3}
+
+    def __init__(self, unit_system: UnitSystem = UnitSystem.SI, solver_backend: str = 'exact', cache_size: int = 4096, profiling: bool = False):
+        if solver_backend not in self.SOLVER_BACKENDS:
+            raise ValueError(f"Unknown solver backend '{solver_backend}'. Choose from: {', '.join(self.SOLVER_BACKENDS)}")
+        if solver_backend != 'exact' and sp is None:
+            raise ImportError(f"The '{solver_backend}' solver backend requires SymPy, which is not installed.")
         self.unit_system = unit_system
+        self.solver_backend = solver_backend
+        self._solve_cache = LRUCache(cache_size)
+        self._pi_cache = LRUCache(cache_size)
+        self._suggestion_cache = LRUCache(cache_size)
+        self.profiling = profiling
+        self.metrics = EngineMetrics()
+        self.metrics_hooks = []
+        self._profile = _NO_PROFILE
+        self.search_limits = dict(self.SEARCH_LIMITS)
         self.quantities = {}
         self.derived_formulas = {}
         self.initialized = False
         print("Python: Engine instance created. Call initialize() to build the library.")
 
-    def initialize(self):
+    def initialize(self, library_paths: Optional[List[str]] = None):
         """
-        Builds the quantity library synchronously. This is designed to work
-        with the existing main.js and may cause a brief hang on load.
+        Builds the quantity library synchronously. In the browser this runs
+        inside worker.js, so the page stays responsive while it loads.
+        library_paths are extra .json/.csv/.qlib libraries merged on top of the
+        built-in one (later files override earlier entries).
         """
         if self.initialized: return
         print("Python: Synchronous initialize() called...")
         self.quantities = self._build_quantity_library()
+        for path in library_paths or []: self.load_library(path)
         self.initialized = True
         print(f"Python: Initialization complete. {len(self.quantities)} quantities loaded.")
 
+    @property
+    def quantities(self) -> Dict[str, PhysicalQuantity]:
+        return self._quantities
+
+    @quantities.setter
+    def quantities(self, library: Dict[str, PhysicalQuantity]):
+        self._quantities = library if isinstance(library, QuantityLibrary) else QuantityLibrary(library)
+        self.clear_cache()
+
+    def add_quantity(self, quantity: PhysicalQuantity):
+        """Adds (or replaces) a library entry and invalidates cached results."""
+        self._quantities[quantity.name] = quantity
+        self.clear_cache()
+
+    def remove_quantity(self, name: str) -> PhysicalQuantity:
+        """Removes a library entry and invalidates cached results."""
+        quantity = self._quantities.pop(name)
+        self.clear_cache()
+        return quantity
+
+    def load_library(self, source: Union[str, Dict[str, PhysicalQuantity]], on_conflict: str = 'override'):
+        """Merges a library file (or mapping) into the current library."""
+        extra = load_quantity_library(source) if isinstance(source, str) else source
+        self.quantities = merge_quantity_libraries(self._quantities, extra, on_conflict=on_conflict)
+
+    def clear_cache(self):
+        """Drops all cached solver results, Π bases and suggestion rankings. Called whenever the library changes."""
+        for cache in (self._solve_cache, self._pi_cache, self._suggestion_cache): cache.clear()
+        self._cache_version = self._quantities.version if hasattr(self, '_quantities') else 0
+
+    def _check_cache_version(self):
+        """Clears the caches if the library was changed behind add_quantity/remove_quantity."""
+        if self._cache_version != self._quantities.version: self.clear_cache()
+
+    def worker_settings(self) -> Dict:
+        """
+        Configuration that engine copies in worker processes need to answer
+        like this one: the constructor arguments and the search limits.
+        Metrics hooks stay in this process.
+        """
+        return {'unit_system': self.unit_system, 'solver_backend': self.solver_backend, 'cache_size': self._solve_cache.maxsize, 'profiling': self.profiling, 'search_limits': dict(self.search_limits)}
+
+    def cache_info(self) -> Dict[str, int]:
+        """Hit/miss/eviction statistics of the solver result cache."""
+        return self._solve_cache.info()
+
     def _build_quantity_library(self) -> Dict[str, PhysicalQuantity]:
         """The full, real library of physical quantities."""
         base_quantities = {
@@ -92,20 +1014,20 @@ class EnhancedPhysicsDisentangler:
             'current': PhysicalQuantity('current', 'I', {'Q': 1, 'T': -1}, description="Rate of charge flow"),
             'resistance': PhysicalQuantity('resistance', 'R_elec', {'M': 1, 'L': 2, 'T': -3, 'Q': -2}, description="Opposition to current flow"),
             'capacitance': PhysicalQuantity('capacitance', 'C_cap', {'M': -1, 'L': -2, 'T': 4, 'Q': 2}, description="Charge storage capacity"),
-            'planck_constant': PhysicalQuantity('planck_constant', 'h', {'M': 1, 'L': 2, 'T': -1}, description="Quantum of action"),
-            'reduced_planck': PhysicalQuantity('reduced_planck', 'ℏ', {'M': 1, 'L': 2, 'T': -1}, description="h/2π"),
-            'boltzmann_constant': PhysicalQuantity('boltzmann_constant', 'k_B', {'M': 1, 'L': 2, 'T': -2, 'Θ': -1}, description="Thermal energy scale"),
-            'speed_of_light': PhysicalQuantity('speed_of_light', 'c', {'L': 1, 'T': -1}, description="Universal speed limit"),
-            'speed_of_light_cubed': PhysicalQuantity('speed_of_light_cubed', 'c^3', {'L': 3, 'T': -3}, description="Universal speed limit cubed"),
-            'gravitational_constant': PhysicalQuantity('gravitational_constant', 'G', {'M': -1, 'L': 3, 'T': -2}, description="Gravity coupling constant"),
-            'gas_constant': PhysicalQuantity('gas_constant', 'R_gas', {'M': 1, 'L': 2, 'T': -2, 'Θ': -1, 'N': -1}, description="Universal gas constant"),
-            'avogadro_number': PhysicalQuantity('avogadro_number', 'N_A', {'N': -1}, description="Particles per mole"),
-            'elementary_charge': PhysicalQuantity('elementary_charge', 'e', {'Q': 1}, description="Fundamental charge unit"),
-            'vacuum_permittivity': PhysicalQuantity('vacuum_permittivity', 'ε₀', {'M': -1, 'L': -3, 'T': 4, 'Q': 2}, description="Electric constant"),
-            'vacuum_permeability': PhysicalQuantity('vacuum_permeability', 'μ₀', {'M': 1, 'L': 1, 'T': -2, 'Q': -2}, description="Magnetic constant"),
-            'fine_structure': PhysicalQuantity('fine_structure', 'α', {}, description="Electromagnetic coupling constant"),
-            'electron_mass': PhysicalQuantity('electron_mass', 'm_e', {'M': 1}, description="Mass of electron"),
-            'proton_mass': PhysicalQuantity('proton_mass', 'm_p', {'M': 1}, description="Mass of proton"),
+            'planck_constant': PhysicalQuantity('planck_constant', 'h', {'M': 1, 'L': 2, 'T': -1}, typical_values={'SI': 6.62607015e-34}, description="Quantum of action"),
+            'reduced_planck': PhysicalQuantity('reduced_planck', 'ℏ', {'M': 1, 'L': 2, 'T': -1}, typical_values={'SI': 1.054571817e-34}, description="h/2π"),
+            'boltzmann_constant': PhysicalQuantity('boltzmann_constant', 'k_B', {'M': 1, 'L': 2, 'T': -2, 'Θ': -1}, typical_values={'SI': 1.380649e-23}, description="Thermal energy scale"),
+            'speed_of_light': PhysicalQuantity('speed_of_light', 'c', {'L': 1, 'T': -1}, typical_values={'SI': 299792458.0}, description="Universal speed limit"),
+            'speed_of_light_cubed': PhysicalQuantity('speed_of_light_cubed', 'c^3', {'L': 3, 'T': -3}, typical_values={'SI': 2.694400241737399e25}, description="Universal speed limit cubed"),
+            'gravitational_constant': PhysicalQuantity('gravitational_constant', 'G', {'M': -1, 'L': 3, 'T': -2}, typical_values={'SI': 6.6743e-11}, description="Gravity coupling constant"),
+            'gas_constant': PhysicalQuantity('gas_constant', 'R_gas', {'M': 1, 'L': 2, 'T': -2, 'Θ': -1, 'N': -1}, typical_values={'SI': 8.314462618}, description="Universal gas constant"),
+            'avogadro_number': PhysicalQuantity('avogadro_number', 'N_A', {'N': -1}, typical_values={'SI': 6.02214076e23}, description="Particles per mole"),
+            'elementary_charge': PhysicalQuantity('elementary_charge', 'e', {'Q': 1}, typical_values={'SI': 1.602176634e-19}, description="Fundamental charge unit"),
+            'vacuum_permittivity': PhysicalQuantity('vacuum_permittivity', 'ε₀', {'M': -1, 'L': -3, 'T': 4, 'Q': 2}, typical_values={'SI': 8.8541878128e-12}, description="Electric constant"),
+            'vacuum_permeability': PhysicalQuantity('vacuum_permeability', 'μ₀', {'M': 1, 'L': 1, 'T': -2, 'Q': -2}, typical_values={'SI': 1.25663706212e-6}, description="Magnetic constant"),
+            'fine_structure': PhysicalQuantity('fine_structure', 'α', {}, typical_values={'SI': 7.2973525693e-3}, description="Electromagnetic coupling constant"),
+            'electron_mass': PhysicalQuantity('electron_mass', 'm_e', {'M': 1}, typical_values={'SI': 9.1093837015e-31}, description="Mass of electron"),
+            'proton_mass': PhysicalQuantity('proton_mass', 'm_p', {'M': 1}, typical_values={'SI': 1.67262192369e-27}, description="Mass of proton"),
         }
         return base_quantities
 
@@ -115,91 +1037,299 @@ class EnhancedPhysicsDisentangler:
             return js_proxy_or_list.to_py()
         return js_proxy_or_list
 
-    def discover_relationship(self, output_quantity: str, input_quantities: List[str], constants_to_include: Optional[List[str]] = None, auto_search: bool = False, verbose: bool = False) -> Dict:
-        """Main discovery engine. Now works in both browser and command line."""
+    def discover_relationship(self, output_quantity: str, input_quantities: List[str], constants_to_include: Optional[List[str]] = None, auto_search: bool = False, verbose: bool = False, search_limits: Optional[Dict] = None, pi_groups: bool = True, profile: Optional[bool] = None) -> Dict:
+        """
+        Main discovery engine. Now works in both browser and command line.
+        search_limits overrides self.search_limits (max_depth, max_nodes,
+        time_budget in seconds, top_k) for the auto-search. With pi_groups, an
+        underdetermined hypothesis also returns its basis of Π groups.
+        profile overrides self.profiling for this call.
+        """
+        return self._drain(self._discover(output_quantity, input_quantities, constants_to_include, auto_search, verbose, search_limits, pi_groups, profile))
+
+    def discover_steps(self, output_quantity: str, input_quantities: List[str], constants_to_include: Optional[List[str]] = None, auto_search: bool = False, verbose: bool = False, search_limits: Optional[Dict] = None, pi_groups: bool = True, profile: Optional[bool] = None, progress_every: int = 25):
+        """
+        Cooperative form of discover_relationship for hosts that must stay
+        responsive (the browser worker). A generator of events:
+        - {'event': 'progress', 'stage': 'auto_search', ...search stats},
+          every progress_every expanded nodes;
+        - {'event': 'solution', 'formula', 'added_constants'} for each
+          solution the auto-search finds;
+        - {'event': 'result', 'result': ...} last, holding exactly what
+          discover_relationship would return.
+        Between events the caller can handle other work, or stop the
+        discovery with close().
+        """
+        result = yield from self._discover(output_quantity, input_quantities, constants_to_include, auto_search, verbose, search_limits, pi_groups, profile, progress_every)
+        yield {'event': 'result', 'result': result}
+
+    @staticmethod
+    def _drain(steps):
+        """Runs an event generator to the end and returns its return value."""
+        while True:
+            try:
+                next(steps)
+            except StopIteration as done:
+                return done.value
+
+    def _discover(self, output_quantity, input_quantities, constants_to_include, auto_search, verbose, search_limits, pi_groups, profile=None, progress_every=None):
+        args = (output_quantity, input_quantities, constants_to_include, auto_search, verbose, search_limits, pi_groups, progress_every)
+        if not (self.profiling if profile is None else profile):
+            return (yield from self._discover_stages(*args))
+        outer, self._profile = self._profile, DiscoveryProfile()
+        cache_before = self._solve_cache.info()
+        try:
+            result = yield from self._discover_stages(*args)
+            report = self._profile.as_dict()
+        finally:
+            self._profile = outer
+        cache_after = self._solve_cache.info()
+        report['cache'] = {key: cache_after[key] - cache_before[key] for key in ('hits', 'misses', 'evictions')}
+        report['cache']['size'] = cache_after['size']
+        report['success'] = result.get('success', False)
+        result['profile'] = report
+        self.metrics.add(report)
+        for hook in self.metrics_hooks:
+            try:
+                hook(report)
+            except Exception as e:
+                print(f"Python: metrics hook {hook!r} failed: {type(e).__name__}: {e}")
+        return result
+
+    def _discover_stages(self, output_quantity, input_quantities, constants_to_include, auto_search, verbose, search_limits, pi_groups, progress_every):
+        profile = self._profile
         input_quantities = self._to_python_list(input_quantities)
         constants_to_include = self._to_python_list(constants_to_include)
 
+        unique_qs, failed = self._hypothesis_quantities(output_quantity, input_quantities, constants_to_include)
+        if failed: return failed
+
+        with profile.stage('matrix'):
+            dimensions = self.get_all_dimensions(unique_qs)
+        if not dimensions and len(unique_qs) > 1: return self._dimensionless_result(unique_qs)
+
+        status, exponents, message = self.solve_and_diagnose(unique_qs, dimensions)
+        result = self._diagnosis_result(unique_qs, status, exponents, message, pi_groups)
+
+        if auto_search and status in self.SEARCHED_STATUSES:
+            limits = {**self.search_limits, **(search_limits or {})}
+            with profile.stage('auto_search'):
+                solutions, stats, search_log = yield from self._iter_search_constants(unique_qs, verbose=verbose, progress_every=progress_every, **limits)
+            for key in ('nodes_expanded', 'nodes_generated', 'pruned', 'solutions_found'): profile.count(f'search_{key}', stats[key])
+            if solutions:
+                best = dict(solutions[0])
+                added = best.pop('added_constants')
+                best['message'] = f"Auto-search found a solution by adding {', '.join(repr(name) for name in added)}."
+                best['added_constants'] = added
+                best['solutions'] = solutions
+                best['search_stats'] = stats
+                return best
+            
+            final_message = result['message'] + "\n\n--- Auto-Search Log ---\n" + "\n".join(search_log)
+            return {'success': False, 'message': final_message, 'search_stats': stats, **{key: result[key] for key in ('pi_groups',) if key in result}}
+
+        return result
+
+    SEARCHED_STATUSES = ('FAIL_INCONSISTENT', 'FAIL_UNDERDETERMINED')
+
+    def _hypothesis_quantities(self, output_quantity: str, input_quantities: List[str], constants_to_include: Optional[List[str]]) -> Tuple[Optional[List[PhysicalQuantity]], Optional[Dict]]:
+        """The distinct quantities of a hypothesis, output first, or None and the failed result when the engine is not initialized or a name is unknown."""
         if not self.initialized:
-            return {'success': False, 'message': 'FATAL ERROR: Engine not initialized. The initialize() method must be called first.'}
-        
+            return None, {'success': False, 'message': 'FATAL ERROR: Engine not initialized. The initialize() method must be called first.'}
         try:
             all_qs_names = [output_quantity] + input_quantities + (constants_to_include or [])
             seen = set()
-            unique_qs = [self.quantities[name] for name in all_qs_names if name not in seen and not seen.add(name)]
+            return [self.quantities[name] for name in all_qs_names if name not in seen and not seen.add(name)], None
         except KeyError as e:
-            return {'success': False, 'message': f"Unknown quantity: '{e}'. Please check the list of available quantities."}
-            
-        dimensions = self.get_all_dimensions(unique_qs)
-        if not dimensions and len(unique_qs) > 1:
-             return { 'success': True, 'formula': f"{unique_qs[0].symbol} = Π × {'×'.join(q.symbol for q in unique_qs[1:])}", 'message': "Relationship between dimensionless quantities." }
+            return None, {'success': False, 'message': f"Unknown quantity: '{e}'. Please check the list of available quantities."}
 
-        status, exponents, message = self.solve_and_diagnose(unique_qs, dimensions)
-        
+    @staticmethod
+    def _dimensionless_result(quantities: List[PhysicalQuantity]) -> Dict:
+        return {'success': True, 'formula': f"{quantities[0].symbol} = Π × {'×'.join(q.symbol for q in quantities[1:])}", 'message': "Relationship between dimensionless quantities."}
+
+    def _diagnosis_result(self, quantities: List[PhysicalQuantity], status: str, exponents: Optional[np.ndarray], message: str, pi_groups: bool, signature=None) -> Dict:
+        """discover_relationship's result for a solve_and_diagnose outcome, before any auto-search."""
+        profile = self._profile
         if status == 'SUCCESS':
-            formula = self.format_formula(unique_qs, exponents)
-            validation = self.validate_physical_reasonableness(formula, unique_qs, exponents)
-            return { 'success': True, 'formula': formula, 'validation': validation, 'message': message }
-
-        if auto_search and status in ['FAIL_INCONSISTENT', 'FAIL_UNDERDETERMINED']:
-            search_log = ["Auto-search initiated..."]
-            suggestions = []
-            if status == 'FAIL_UNDERDETERMINED':
-                suggestions = self._get_suggestions(unique_qs, missing_dims=None)
-            else: 
-                input_dim_names = {dim for q in unique_qs[1:] for dim in q.dimensions}
-                missing_dims_dict = { dim: power for dim, power in unique_qs[0].dimensions.items() if power != 0 and dim not in input_dim_names }
-                suggestions = self._get_suggestions(unique_qs, missing_dims=missing_dims_dict if missing_dims_dict else None)
-            
-            for suggestion in suggestions:
-                if suggestion in {q.name for q in unique_qs}: continue
-                
+            with profile.stage('format'):
+                formula = self.format_formula(quantities, exponents)
+            with profile.stage('validate'):
+                validation = self.validate_physical_reasonableness(formula, quantities, exponents)
+            return { 'success': True, 'formula': formula, 'validation': validation, 'message': message, 'quantities': [q.name for q in quantities], 'exponents': [float(x) for x in exponents] }
+
+        result = {'success': False, 'message': message}
+        if pi_groups and status == 'FAIL_UNDERDETERMINED':
+            with profile.stage('pi_groups'):
+                result['pi_groups'] = self._pi_groups(quantities, signature)
+            result['message'] += "\n       Π groups:\n" + "\n".join(f"         Π{i} : {group['formula']}" for i, group in enumerate(result['pi_groups'], 1))
+        return result
+
+    def _search_constants(self, base_qs: List[PhysicalQuantity], max_depth: int = 4, max_nodes: int = 2000, time_budget: Optional[float] = 5.0, top_k: int = 3, verbose: bool = False) -> Tuple[List[Dict], Dict, List[str]]:
+        """Runs _iter_search_constants to completion. Returns (solutions, stats, log)."""
+        return self._drain(self._iter_search_constants(base_qs, max_depth, max_nodes, time_budget, top_k, verbose))
+
+    def _iter_search_constants(self, base_qs: List[PhysicalQuantity], max_depth: int = 4, max_nodes: int = 2000, time_budget: Optional[float] = 5.0, top_k: int = 3, verbose: bool = False, progress_every: Optional[int] = None):
+        """
+        Best-first search over sets of constants to add to a failing hypothesis.
+
+        States are sets of added constants. Children come from _get_suggestions
+        and are expanded cheapest-first: each addition costs 1 + 1/(1 + score),
+        so fewer constants win, and higher-scoring suggestions win within a depth.
+        A unique solution needs every input column to raise the rank. A column
+        that does not raise it leaves a free dimensionless group that no later
+        addition can remove, so that state is pruned. The rank is tracked with an
+        IncrementalEchelon, one column at a time. A goal state is only a
+        solution if every user input keeps a nonzero exponent; added constants
+        that end up with exponent 0 are dropped from it (see _search_solution),
+        and each set of constants is reported once.
+
+        A generator: it yields a 'solution' event per solution and, with
+        progress_every, a 'progress' event every progress_every expanded nodes
+        (see discover_steps). It returns (solutions, stats, log). solutions
+        holds at most top_k results, ordered by validation confidence (ties
+        keep search order).
+        """
+        start = time.perf_counter()
+        stats = {'nodes_expanded': 0, 'nodes_generated': 0, 'pruned': 0, 'solutions_found': 0, 'elapsed': 0.0, 'stopped_by': 'exhausted'}
+        search_log = ["Auto-search initiated..."]
+        library = self._quantities
+        vector = lambda q: library.row(q.name).tolist()
+        output_vec = vector(base_qs[0])
+
+        echelon = IncrementalEchelon()
+        for q in base_qs[1:]:
+            echelon = echelon.add(vector(q))
+            if echelon is None:
+                stats['pruned'] += 1
+                stats['elapsed'] = time.perf_counter() - start
+                search_log.append("   ► The inputs already form a free dimensionless group; adding constants cannot make the solution unique.")
+                return [], stats, search_log
+
+        counter = itertools.count()
+        frontier = [(0.0, next(counter), (), echelon)]
+        visited = {frozenset()}
+        solutions, found = [], set()
+        while frontier:
+            if stats['nodes_expanded'] >= max_nodes:
+                stats['stopped_by'] = 'max_nodes'; break
+            if time_budget is not None and time.perf_counter() - start > time_budget:
+                stats['stopped_by'] = 'time_budget'; break
+            cost, _, added, echelon = heapq.heappop(frontier)
+            stats['nodes_expanded'] += 1
+            if progress_every and stats['nodes_expanded'] % progress_every == 0:
+                stats['elapsed'] = time.perf_counter() - start
+                yield {'event': 'progress', 'stage': 'auto_search', **stats, 'trying': list(added)}
+            current_qs = base_qs + [self.quantities[name] for name in added]
+
+            if added and echelon.spans(output_vec):
+                solution = self._search_solution(current_qs, added)
+                if solution is None or frozenset(solution['added_constants']) in found:
+                    stats['pruned'] += 1
+                    continue
+                found.add(frozenset(solution['added_constants']))
+                solutions.append(solution)
+                stats['solutions_found'] += 1
+                yield {'event': 'solution', 'formula': solution['formula'], 'added_constants': solution['added_constants']}
                 if verbose:
-                    search_log.append(f"   ► Trying to add '{suggestion}'...")
-                
-                new_constants = (constants_to_include or []) + [suggestion]
-                recursive_result = self.discover_relationship(output_quantity, input_quantities, new_constants, auto_search=True, verbose=False)
-                
-                if recursive_result.get('success'):
-                    recursive_result['message'] = f"Auto-search found a solution by adding '{suggestion}'."
-                    return recursive_result
-            
-            final_message = message + "\n\n--- Auto-Search Log ---\n" + "\n".join(search_log)
-            return {'success': False, 'message': final_message}
+                    search_log.append(f"   ► Solution with {', '.join(added)}: {solution['formula']}")
+                if len(solutions) >= top_k:
+                    stats['stopped_by'] = 'top_k'; break
+                continue
+            if len(added) >= max_depth: continue
+
+            input_dim_names = {dim for q in current_qs[1:] for dim in q.dimensions}
+            missing_dims_dict = {dim: power for dim, power in current_qs[0].dimensions.items() if power != 0 and dim not in input_dim_names}
+            current_names = {q.name for q in current_qs}
+            for name, score in self._score_suggestions(current_qs, missing_dims=missing_dims_dict or None):
+                if name in current_names: continue
+                key = frozenset(added + (name,))
+                if key in visited: continue
+                visited.add(key)
+                child = echelon.add(vector(self.quantities[name]))
+                if child is None:
+                    stats['pruned'] += 1
+                    continue
+                if verbose:
+                    search_log.append(f"   ► Trying to add '{name}'" + (f" (after {', '.join(added)})..." if added else "..."))
+                stats['nodes_generated'] += 1
+                heapq.heappush(frontier, (cost + 1.0 + 1.0 / (1.0 + score), next(counter), added + (name,), child))
 
-        return {'success': False, 'message': message}
+        stats['elapsed'] = time.perf_counter() - start
+        if not solutions:
+            search_log.append(f"   ► No solution within limits (depth ≤ {max_depth}, {stats['nodes_expanded']} nodes expanded, {stats['pruned']} pruned, stopped by {stats['stopped_by']}).")
+        solutions.sort(key=lambda sol: sol['validation']['confidence_score'], reverse=True)
+        return solutions, stats, search_log
+
+    def _search_solution(self, quantities: List[PhysicalQuantity], added: Tuple[str, ...]) -> Optional[Dict]:
+        """
+        Solves a goal state exactly. Returns None if one of the user's own
+        inputs ends up with exponent 0, since the law would not involve it.
+        Added constants with exponent 0 are dropped: the solution belongs to
+        the smaller set of constants.
+        """
+        status, exponents, message = self.solve_and_diagnose(quantities, self.get_all_dimensions(quantities))
+        if status != 'SUCCESS': return None
+        num_base = len(quantities) - len(added)
+        if any(abs(x) < 1e-10 for x in exponents[1:num_base]): return None
+        keep = [i for i, x in enumerate(exponents) if i < num_base or abs(x) >= 1e-10]
+        if len(keep) < len(quantities):
+            added = tuple(quantities[i].name for i in keep[num_base:])
+            quantities, exponents = [quantities[i] for i in keep], exponents[keep]
+        with self._profile.stage('format'):
+            formula = self.format_formula(quantities, exponents)
+        with self._profile.stage('validate'):
+            validation = self.validate_physical_reasonableness(formula, quantities, exponents)
+        return {'success': True, 'formula': formula, 'validation': validation, 'added_constants': list(added), 'quantities': [q.name for q in quantities], 'exponents': [float(x) for x in exponents]}
 
     def get_all_dimensions(self, quantities: List[PhysicalQuantity]) -> List[str]:
         all_dims = set()
-        for q in quantities: all_dims.update(q.dimensions.keys())
+        for q in quantities: all_dims.update(BASE_DIMENSIONS[i] for i, power in enumerate(q.dims) if power != 0)
         return sorted(list(all_dims))
 
     def build_dimensional_matrix(self, quantities: List[PhysicalQuantity], dimensions: List[str]) -> np.ndarray:
-        return np.array([[q.dimensions.get(dim, 0) for q in quantities] for dim in dimensions], dtype=float)
+        return np.array([[q.exponent(dim) for q in quantities] for dim in dimensions], dtype=float)
 
     def solve_and_diagnose(self, quantities: List[PhysicalQuantity], dimensions: List[str]) -> Tuple[str, Optional[np.ndarray], str]:
-        """Solves the dimensional analysis problem with a robust solver for Pyodide."""
+        """Solves the dimensional analysis problem with a single exact elimination pass (no SymPy required)."""
         if len(quantities) < 2: return 'FAIL_INSUFFICIENT_VARS', None, "Hypothesis requires at least 2 quantities."
         
         input_dim_names = {dim for q in quantities[1:] for dim in q.dimensions}
         missing_dims_dict = {dim: power for dim, power in quantities[0].dimensions.items() if power != 0 and dim not in input_dim_names}
-        if missing_dims_dict:
-            suggestions = self._get_suggestions(quantities, missing_dims=missing_dims_dict)
-            superscript_map = str.maketrans("-0123456789", "⁻⁰¹²³⁴⁵⁶⁷⁸⁹")
-            missing_dims_formatted = [f"{dim}{str(power).translate(superscript_map)}" if power != 1 else dim for dim, power in sorted(missing_dims_dict.items())]
-            return 'FAIL_INCONSISTENT', None, f"Hypothesis is impossible. Inputs are missing required dimensions.\n       Reason: Output requires '{', '.join(missing_dims_formatted)}', not present in inputs.\n       Suggestion: Try adding: {', '.join(suggestions)}"
-
-        dim_matrix = self.build_dimensional_matrix(quantities, dimensions)
-        A = sp.Matrix(dim_matrix[:, 1:])
-        b = sp.Matrix(-dim_matrix[:, 0])
-        num_inputs, rank_A = A.cols, A.rank()
-        
-        if rank_A < A.row_join(b).rank():
-            rref_aug, _ = A.row_join(b).rref()
-            failing_dim = "an unknown dimension"
-            for row in range(rref_aug.rows):
-                if all(rref_aug[row, col] == 0 for col in range(num_inputs)) and rref_aug[row, -1] != 0:
-                    failing_dim = dimensions[row]; break
+        if missing_dims_dict: return self._diagnose_missing(quantities, missing_dims_dict)
+
+        with self._profile.stage('matrix'):
+            signature = self.dimension_signature(quantities, dimensions)
+        return self._diagnose(quantities, dimensions, signature)
+
+    def _diagnose_missing(self, quantities: List[PhysicalQuantity], missing_dims_dict: Dict[str, int]) -> Tuple[str, None, str]:
+        """solve_and_diagnose's outcome when the output has dimensions that no input has."""
+        suggestions = self._get_suggestions(quantities, missing_dims=missing_dims_dict)
+        superscript_map = str.maketrans("-0123456789", "⁻⁰¹²³⁴⁵⁶⁷⁸⁹")
+        missing_dims_formatted = [f"{dim}{str(power).translate(superscript_map)}" if power != 1 else dim for dim, power in sorted(missing_dims_dict.items())]
+        return 'FAIL_INCONSISTENT', None, f"Hypothesis is impossible. Inputs are missing required dimensions.\n       Reason: Output requires '{', '.join(missing_dims_formatted)}', not present in inputs.\n       Suggestion: Try adding: {', '.join(suggestions)}"
+
+    def _diagnose(self, quantities: List[PhysicalQuantity], dimensions: List[str], signature: Tuple[Tuple[int, ...], ...], solved: Optional[Tuple] = None) -> Tuple[str, Optional[np.ndarray], str]:
+        """
+        solve_and_diagnose past the missing-dimension check: the exact solve of
+        signature (solved, when the caller already has it, else cached or
+        new), with its message.
+        """
+        num_inputs = len(quantities) - 1
+        cached = solved
+        if cached is None:
+            self._check_cache_version()
+            cached = self._solve_cache.get(signature)
+        if cached is None:
+            try:
+                with self._profile.stage('solve'):
+                    cached = self._solve_linear_system([list(row) for row in signature])
+            except Exception as e:
+                return 'FAIL_SOLVER', None, f"A low-level solver error occurred in the {self.solver_backend} backend: {type(e).__name__}: {e}"
+            self._solve_cache.put(signature, cached)
+        rank_A, failing_row, solution = cached
+
+        if failing_row is not None:
+            failing_dim = dimensions[failing_row] if failing_row < len(dimensions) else "an unknown dimension"
             suggestions = self._get_suggestions(quantities, missing_dims=None)
             return 'FAIL_INCONSISTENT', None, f"Hypothesis is dimensionally inconsistent.\n       Reason: The equation for '{failing_dim}' cannot be satisfied.\n       Analysis: The quantities have conflicting relationships.\n       Suggestion: A fundamental constant is likely needed. Try: {', '.join(suggestions)}"
         
@@ -208,40 +1338,122 @@ class EnhancedPhysicsDisentangler:
             return 'FAIL_UNDERDETERMINED', None, f"Hypothesis is underdetermined. Infinite solutions exist.\n       Reason: {num_inputs - rank_A + 1} dimensionless groups can be formed.\n       Suggestion: Add constants to constrain the system, such as: {', '.join(suggestions)}"
         
         else:
-            # --- THE ROBUST SOLVER FIX ---
-            try:
-                solution_vector = sp.linsolve((A, b))
-                if not solution_vector:
-                    raise sp.solvers.solvers.UnsolvableError("linsolve returned no solution")
-                
-                solution_tuple = list(solution_vector)[0]
-                input_exponents = np.array(solution_tuple, dtype=float).flatten()
-                solution = np.concatenate([[1.0], -input_exponents])
-                return 'SUCCESS', solution, "Unique dimensionless relationship found."
-            except Exception as e:
-                return 'FAIL_SOLVER', None, f"A low-level solver error occurred in SymPy: {type(e).__name__}: {e}"
+            input_exponents = np.array([float(x) for x in solution])
+            solution = np.concatenate([[1.0], -input_exponents])
+            return 'SUCCESS', solution, "Unique dimensionless relationship found."
+
+    @staticmethod
+    def dimension_signature(quantities: List[PhysicalQuantity], dimensions: List[str]) -> Tuple[Tuple[int, ...], ...]:
+        """
+        Canonical, hashable form of the dimension matrix: one row per dimension,
+        output column first, then the inputs in order. Names and symbols are not
+        part of it, so aliases with the same dimensions share a signature.
+        """
+        columns = [q.dims for q in quantities]
+        rows = []
+        for dim in dimensions:
+            index = _DIMENSION_INDEX.get(dim, len(BASE_DIMENSIONS))
+            rows.append(tuple(dims[index] if index < len(dims) else 0 for dims in columns))
+        return tuple(rows)
+
+    def _solve_linear_system(self, dim_rows: List[List[int]]) -> Tuple[int, Optional[int], Optional[List[Fraction]]]:
+        """
+        Solves A·x = b for a dimension matrix whose first column is the output
+        (b = -output column, A = input columns) using the configured backend.
+        Same return contract as exact_solve.
+        """
+        A_rows = [row[1:] for row in dim_rows]
+        b = [-row[0] for row in dim_rows]
+        if self.solver_backend == 'sympy':
+            return self._solve_linear_system_sympy(A_rows, b)
+        result = exact_solve(A_rows, b)
+        if self.solver_backend == 'crosscheck':
+            reference = self._solve_linear_system_sympy(A_rows, b)
+            if result != reference:
+                raise ArithmeticError(f"exact solver returned {result}, SymPy returned {reference}")
+        return result
+
+    def _solve_linear_system_sympy(self, A_rows: List[List[int]], b: List[int]) -> Tuple[int, Optional[int], Optional[List[Fraction]]]:
+        """The original SymPy path (rank, rref, linsolve), kept as a cross-check backend."""
+        A, b = sp.Matrix(A_rows), sp.Matrix(b)
+        num_inputs, rank_A = A.cols, A.rank()
+        if rank_A < A.row_join(b).rank():
+            return rank_A, conflicting_row(A_rows, list(b)), None
+        if rank_A < num_inputs: return rank_A, None, None
+        solution_vector = sp.linsolve((A, b))
+        if not solution_vector:
+            raise ArithmeticError("linsolve returned no solution")
+        solution_tuple = list(solution_vector)[0]
+        return rank_A, None, [Fraction(int(sp.numer(x)), int(sp.denom(x))) for x in solution_tuple]
 
     def _get_suggestions(self, quantities: List[PhysicalQuantity], missing_dims: Optional[Dict[str, int]] = None) -> List[str]:
+        return [name for name, score in self._score_suggestions(quantities, missing_dims)]
+
+    SUGGESTION_BONUS = ('speed_of_light', 'planck_constant', 'gravitational_constant', 'boltzmann_constant')
+
+    def _score_suggestions(self, quantities: List[PhysicalQuantity], missing_dims: Optional[Dict[str, int]] = None) -> List[Tuple[str, float]]:
+        """
+        Ranked (name, score) suggestions; _get_suggestions is the names-only view.
+        With missing dimensions, every library entry is scored in one vectorized
+        pass over the library matrix. An exact match (hash lookup) scores 10.
+        The same set of dimensions with other powers scores 5. Otherwise the
+        score is +1 per missing dimension covered and -0.5 per extra dimension.
+        """
+        with self._profile.stage('suggestions'):
+            return self._rank_suggestions(quantities, missing_dims)
+
+    def _rank_suggestions(self, quantities: List[PhysicalQuantity], missing_dims: Optional[Dict[str, int]]) -> List[Tuple[str, float]]:
         current_quantity_names = {q.name for q in quantities}
         if missing_dims:
-            suggestions = []
-            missing_dim_keys = set(missing_dims.keys())
-            for name, quantity in self.quantities.items():
+            library = self._quantities
+            missing_vec = library.vector(missing_dims)
+            if missing_vec is None or not len(library): return []
+            self._check_cache_version()
+            ranked = self._suggestion_cache.get(missing_vec.tobytes())
+            if ranked is None: ranked = self._rank_missing([missing_dims])[0]
+            order, scores = ranked
+            best = []
+            # The ranking is shared by every hypothesis with these missing dimensions; the quantities already in this one are skipped here.
+            for i in order:
+                name = library.name_at(i)
                 if name in current_quantity_names: continue
-                q_dims, score = quantity.dimensions, 0.0
-                q_dim_keys = set(q_dims.keys())
-                if q_dim_keys == missing_dim_keys: score += 10.0 if q_dims == missing_dims else 5.0
-                else:
-                    if not any(dim in q_dims for dim in missing_dim_keys): continue
-                    score += sum(1.0 for dim in missing_dim_keys if dim in q_dims)
-                    score -= len(q_dim_keys - missing_dim_keys) * 0.5
-                if name in ['speed_of_light', 'planck_constant', 'gravitational_constant', 'boltzmann_constant']: score += 0.2
-                if score > 0: suggestions.append((name, score))
-            suggestions.sort(key=lambda x: x[1], reverse=True)
-            return [name for name, score in suggestions[:4]]
+                best.append((name, float(scores[i])))
+                if len(best) == 4: break
+            return best
         else:
+            # No dimension is missing outright: fall back to the usual constants, scored by their order.
             possible_additions = ['speed_of_light', 'planck_constant', 'gravitational_constant', 'boltzmann_constant', 'elementary_charge']
-            return [p for p in possible_additions if p not in current_quantity_names]
+            remaining = [p for p in possible_additions if p not in current_quantity_names and p in self._quantities]
+            return [(p, float(len(remaining) - i)) for i, p in enumerate(remaining)]
+
+    def _rank_missing(self, missing: List[Dict[str, int]], chunk: int = 256) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Library rows ranked as suggestions for each missing-dimension dict,
+        best first, with the score of every row (see _score_suggestions), and
+        cached by missing vector. The overlap and extra-dimension counts for
+        a chunk of missing vectors are two matrix products with the library's
+        nonzero pattern.
+        """
+        library = self._quantities
+        present = (library.matrix != 0).astype(np.int32)
+        bonus_rows = [library.index_of(name) for name in self.SUGGESTION_BONUS if name in library]
+        rankings = []
+        for start in range(0, len(missing), chunk):
+            block = missing[start:start + chunk]
+            vectors = [library.vector(missing_dims) for missing_dims in block]
+            wanted = (np.array(vectors) != 0).astype(np.int32)
+            overlap, extra = present @ wanted.T, present @ (1 - wanted).T
+            same_dims = (overlap == wanted.sum(axis=1)) & (extra == 0)
+            block_scores = np.where(same_dims, 5.0, overlap - 0.5 * extra)
+            for v, (missing_dims, vec) in enumerate(zip(block, vectors)):
+                scores = np.ascontiguousarray(block_scores[:, v])
+                scores[[library.index_of(name) for name in library.lookup(missing_dims)]] = 10.0
+                scores[bonus_rows] += 0.2
+                candidates = np.flatnonzero((same_dims[:, v] | (overlap[:, v] > 0)) & (scores > 0))
+                ranked = (candidates[np.argsort(-scores[candidates], kind='stable')], scores)
+                self._suggestion_cache.put(vec.tobytes(), ranked)
+                rankings.append(ranked)
+        return rankings
 
     def format_formula(self, quantities: List[PhysicalQuantity], exponents: np.ndarray) -> str:
         target_var = quantities[0].symbol
@@ -266,6 +1478,38 @@ class EnhancedPhysicsDisentangler:
         else: formula += "×".join(numerator_terms)
         return formula
 
+    def buckingham_pi_groups(self, quantities: List[PhysicalQuantity]) -> List[Dict]:
+        """
+        Full basis of independent dimensionless Π groups for the given
+        quantities, as small integer exponent vectors: exact integer null space
+        of the dimension matrix, reduced with LLL. Each group is written with
+        format_formula, solved for the output when the group contains it,
+        otherwise for its first quantity. The exponent vectors depend only on
+        the dimension signature and are cached by it.
+        """
+        return self._pi_groups(quantities)
+
+    def _pi_groups(self, quantities: List[PhysicalQuantity], signature: Optional[Tuple[Tuple[int, ...], ...]] = None) -> List[Dict]:
+        if signature is None: signature = self.dimension_signature(quantities, self.get_all_dimensions(quantities))
+        self._check_cache_version()
+        basis = self._pi_cache.get(signature)
+        if basis is None:
+            basis = []
+            for vec in lll_reduce(integer_null_space([list(row) for row in signature] or [[0] * len(quantities)])):
+                g = math.gcd(*vec)
+                if g > 1: vec = [v // g for v in vec]
+                lead = 0 if vec[0] != 0 else next(i for i, v in enumerate(vec) if v != 0)
+                basis.append(tuple(-v for v in vec) if vec[lead] < 0 else tuple(vec))
+            basis.sort(key=lambda vec: (vec[0] == 0, sum(abs(v) for v in vec)))
+            self._pi_cache.put(signature, basis)
+        groups = []
+        for vec in basis:
+            lead = 0 if vec[0] != 0 else next(i for i, v in enumerate(vec) if v != 0)
+            order = [lead] + [i for i in range(len(quantities)) if i != lead]
+            exponents = np.array([1.0] + [-vec[i] / vec[lead] for i in order[1:]])
+            groups.append({'exponents': list(vec), 'formula': self.format_formula([quantities[i] for i in order], exponents)})
+        return groups
+
     def validate_physical_reasonableness(self, formula: str, quantities: List[PhysicalQuantity], exponents: np.ndarray) -> Dict[str, Union[bool, str, float]]:
         validation = { 'dimensionally_correct': True, 'physically_reasonable': True, 'confidence_score': 1.0, 'warnings': [] }
         max_exp = np.max(np.abs(exponents[1:]))
@@ -286,12 +1530,800 @@ class EnhancedPhysicsDisentangler:
                     validation['confidence_score'] *= 0.9
         return validation
 
-# This block is for command-line use and will not run in the browser.
-if __name__ == "__main__":
-    engine = EnhancedPhysicsDisentangler()
-    print("Initializing engine for command-line use...")
-    engine.initialize()
-    print("Engine ready.\n")
+    # --- Batch Discovery ---
+    HYPOTHESIS_FIELDS = ('output_quantity', 'input_quantities', 'constants_to_include', 'auto_search')
+
+    def discover_many(self, hypotheses: List[Union[Dict, Tuple, List]], processes: Optional[int] = None, chunk_size: int = 2000) -> List[Dict]:
+        """
+        Batch form of discover_relationship. Each hypothesis is a dict of
+        discover_relationship arguments, or a tuple (output, inputs[, constants[,
+        auto_search]]). Results come back in input order.
+
+        Identical hypotheses are solved once, and the rest are screened
+        together (see _discover_batch): one exact solve per dimension
+        signature, then only names and formulas per hypothesis. Hypotheses
+        that still need an auto-search, or that ask for a profile, run through
+        discover_relationship. A malformed hypothesis gets a failed result
+        with the reason instead of failing the batch. With processes > 1,
+        contiguous chunks of chunk_size hypotheses run on a multiprocessing
+        pool of warm engines.
+        """
+        hypotheses = list(self._to_python_list(hypotheses))
+        if processes and processes > 1 and len(hypotheses) > chunk_size:
+            import multiprocessing
+            chunks = [hypotheses[i:i + chunk_size] for i in range(0, len(hypotheses), chunk_size)]
+            with multiprocessing.Pool(processes, initializer=_init_worker_engine, initargs=(dict(self._quantities), list(BASE_DIMENSIONS), self.worker_settings())) as pool:
+                return [result for chunk in pool.imap(_discover_many_worker, chunks) for result in chunk]
+
+        results = [None] * len(hypotheses)
+        first, unique, copies, batch = {}, {}, [], []
+        for i, hypothesis in enumerate(hypotheses):
+            try:
+                kwargs = self._hypothesis_kwargs(hypothesis)
+            except ValueError as e:
+                results[i] = {'success': False, 'message': f"Invalid hypothesis: {e}"}
+                continue
+            # Index of the first occurrence of each distinct hypothesis.
+            key = json.dumps(kwargs, sort_keys=True, default=str)
+            if key in first:
+                copies.append((i, first[key]))
+                continue
+            first[key] = i
+            unique[i] = kwargs
+            profile = kwargs.get('profile')
+            if self.profiling if profile is None else profile: continue  # profiled calls keep their per-call report
+            quantities, results[i] = self._hypothesis_quantities(kwargs['output_quantity'], kwargs['input_quantities'], self._to_python_list(kwargs.get('constants_to_include')))
+            if quantities is not None: batch.append((i, kwargs, quantities))
+        if batch:
+            for (i, _, _), result in zip(batch, self._discover_batch(batch)): results[i] = result
+        for i, kwargs in unique.items():
+            if results[i] is None: results[i] = self.discover_relationship(**kwargs)
+        for i, j in copies: results[i] = copy.deepcopy(results[j])
+        return results
+
+    def _discover_batch(self, batch: List[Tuple[int, Dict, List[PhysicalQuantity]]]) -> List[Optional[Dict]]:
+        """
+        discover_relationship without the auto-search, for many hypotheses
+        (index, arguments, quantities) at once. Their rows of the library
+        matrix are stacked into one hypotheses × quantities × dimensions
+        array, so missing dimensions are found for the whole batch in NumPy.
+        The other hypotheses are grouped by their stacked rows, which is their
+        dimension signature. The signatures not yet cached are solved together
+        with exact_solve_many (with the exact backend), and each hypothesis
+        only gets its suggestions, formula and validation. Returns None for a
+        hypothesis whose auto-search still has to run.
+        """
+        library = self._quantities
+        self._check_cache_version()
+        lengths = np.array([len(quantities) for _, _, quantities in batch])
+        rows = np.zeros((len(batch), lengths.max(), library.matrix.shape[1]), dtype=np.int8)
+        for h, (_, _, quantities) in enumerate(batch):
+            rows[h, :len(quantities)] = library.matrix[[library.index_of(q.name) for q in quantities]]
+        missing = (rows[:, 0] != 0) & ~(rows[:, 1:] != 0).any(axis=1)
+        screened = (lengths >= 2) & missing.any(axis=1)
+
+        results, groups, missing_of = [None] * len(batch), {}, {}
+        for h, (_, kwargs, quantities) in enumerate(batch):
+            if not screened[h]:
+                groups.setdefault(rows[h, :lengths[h]].tobytes(), []).append(h)
+            elif not kwargs.get('auto_search'):
+                missing_of[h] = {BASE_DIMENSIONS[d]: int(rows[h, 0, d]) for d in np.flatnonzero(missing[h])}
+
+        # Suggestion rankings for all new missing-dimension vectors at once.
+        new_missing = {}
+        for missing_dims in missing_of.values():
+            key = library.vector(missing_dims).tobytes()
+            if key not in self._suggestion_cache: new_missing.setdefault(key, missing_dims)
+        if new_missing:
+            with self._profile.stage('suggestions'):
+                self._rank_missing(list(new_missing.values()))
+        for h, missing_dims in missing_of.items():
+            _, kwargs, quantities = batch[h]
+            results[h] = self._diagnosis_result(quantities, *self._diagnose_missing(quantities, missing_dims), kwargs.get('pi_groups', True))
+
+        signatures = []
+        for members in groups.values():
+            quantities = batch[members[0]][2]
+            dimensions = self.get_all_dimensions(quantities)
+            signatures.append((dimensions, self.dimension_signature(quantities, dimensions) if dimensions and len(quantities) >= 2 else None))
+        solved = {}
+        if self.solver_backend == 'exact':
+            new = [signature for _, signature in signatures if signature is not None and signature not in self._solve_cache]
+            with self._profile.stage('solve'):
+                solved = dict(zip(new, exact_solve_many([([row[1:] for row in signature], [-row[0] for row in signature]) for signature in new])))
+            for signature, value in solved.items(): self._solve_cache.put(signature, value)
+        for members, (dimensions, signature) in zip(groups.values(), signatures):
+            for h in members:
+                _, kwargs, quantities = batch[h]
+                if not dimensions and len(quantities) > 1:
+                    results[h] = self._dimensionless_result(quantities)
+                    continue
+                if signature is None: status, exponents, message = self.solve_and_diagnose(quantities, dimensions)
+                else: status, exponents, message = self._diagnose(quantities, dimensions, signature, solved.get(signature))
+                if kwargs.get('auto_search') and status in self.SEARCHED_STATUSES: continue
+                results[h] = self._diagnosis_result(quantities, status, exponents, message, kwargs.get('pi_groups', True), signature)
+        return results
+
+    def _hypothesis_kwargs(self, hypothesis: Union[Dict, Tuple, List]) -> Dict:
+        """discover_relationship arguments of one hypothesis; raises ValueError if they are malformed."""
+        hypothesis = self._to_python_list(hypothesis)
+        if isinstance(hypothesis, dict):
+            kwargs = dict(hypothesis)
+        elif isinstance(hypothesis, (list, tuple)):
+            kwargs = dict(zip(self.HYPOTHESIS_FIELDS, hypothesis))
+        else:
+            raise ValueError("A hypothesis must be a dict or an (output, inputs[, constants[, auto_search]]) tuple.")
+        kwargs['input_quantities'] = self._to_python_list(kwargs.get('input_quantities')) or []
+        self.check_discover_arguments(kwargs)
+        kwargs['input_quantities'] = list(kwargs['input_quantities'])
+        return kwargs
+
+    def check_discover_arguments(self, kwargs: Dict):
+        """Raises ValueError unless kwargs are well-formed discover_relationship arguments (names, not their existence)."""
+        unknown = sorted(set(kwargs) - set(self.DISCOVER_FIELDS) - {'verbose'})
+        if unknown: raise ValueError(f"Unknown argument(s): {', '.join(unknown)}.")
+        if not isinstance(kwargs.get('output_quantity'), str): raise ValueError("'output_quantity' must be a quantity name.")
+        for field in ('input_quantities', 'constants_to_include'):
+            value = self._to_python_list(kwargs.get(field))
+            if value is not None and not (isinstance(value, (list, tuple)) and all(isinstance(name, str) for name in value)):
+                raise ValueError(f"'{field}' must be a list of quantity names.")
+        limits = kwargs.get('search_limits')
+        if limits is not None:
+            if not isinstance(limits, dict): raise ValueError("'search_limits' must be an object.")
+            unknown = sorted(set(limits) - set(self.SEARCH_LIMITS))
+            if unknown: raise ValueError(f"Unknown search limit(s): {', '.join(unknown)}. Expected: {', '.join(self.SEARCH_LIMITS)}.")
+            for key, value in limits.items():
+                if isinstance(value, bool) or not (isinstance(value, (int, float)) or (key == 'time_budget' and value is None)):
+                    raise ValueError(f"Search limit '{key}' must be a number.")
+
+    # --- Data Fitting ---
+    def fit_law(self, law, data, columns: Optional[List[str]] = None, chunk_rows: int = FIT_CHUNK_ROWS, residuals: Union[None, bool, str] = None) -> Dict:
+        """
+        Fits the constant Π of one law to measurements.
+
+        law is a successful discovery result (or one of its 'solutions'), or a
+        (quantity names, exponents) pair in the same convention: output first,
+        and output = Π × Π_i q_i^exponent_i over the rest. data is
+        anything _iter_measurement_chunks reads: a dict of arrays, a structured
+        or 2-D array (with columns), or a .npy/.csv path. The data is streamed
+        in chunks of chunk_rows rows, so large files are never loaded whole.
+
+        The fit is done in log space: per row, log Π = log|q_0| - Σ e_i·log|q_i|. Rows
+        with a zero or non-finite value in a used column are skipped.
+        A quantity with no data column (typically a constant) uses its
+        typical value in the engine's unit system.
+
+        Returns:
+        - 'pi': the geometric-mean Π;
+        - 'log_pi_mean' and 'log_pi_std';
+        - 'spread': exp(std), the typical multiplicative scatter;
+        - 'rms_log_residual' and 'max_abs_log_residual';
+        - 'r_squared': log-space R² of the output, when it varies;
+        - row counts and the constants used.
+        With residuals=True the per-row log residuals (NaN for skipped rows)
+        are added as an array. With a .npy path they are streamed to that file
+        instead. Either way this takes a second pass over the data.
+        """
+        fit = self.rank_laws([law], data, columns, chunk_rows)[0]
+        if 'error' in fit: raise ValueError(fit['error'])
+        if residuals:
+            spec = self._law_spec(law)
+            out = None if residuals is True else np.lib.format.open_memmap(os.fspath(residuals), mode='w+', dtype=np.float64, shape=(fit['rows'],))
+            sink = np.empty(fit['rows']) if out is None else out
+            row = 0
+            for log_pi in self._iter_log_pi([spec], data, columns, chunk_rows):
+                sink[row:row + len(log_pi[0])] = log_pi[0] - fit['log_pi_mean']
+                row += len(log_pi[0])
+            if out is None:
+                fit['residuals'] = sink
+            else:
+                out.flush()
+                del out
+                fit['residuals_path'] = os.fspath(residuals)
+        return fit
+
+    def rank_laws(self, laws, data, columns: Optional[List[str]] = None, chunk_rows: int = FIT_CHUNK_ROWS) -> List[Dict]:
+        """
+        Fits competing laws in a single pass over the data (see fit_law), best
+        first. A law whose Π stays most constant has the smallest rms log
+        residual. laws is a list of laws, or one discovery result, which
+        stands for its auto-search 'solutions' when it has them. Each fit
+        gets a 'rank'. A law that cannot be evaluated on this data (a
+        quantity with neither a column nor a typical value) is ranked last,
+        with an 'error'.
+        """
+        if isinstance(laws, dict): laws = laws.get('solutions') or [laws]
+        specs = [self._law_spec(law) for law in laws]
+        stats = [RunningStats() for _ in specs]
+        output_stats = [RunningStats() for _ in specs]
+        rows = 0
+        for log_pi, log_output in self._iter_log_pi(specs, data, columns, chunk_rows, with_output=True):
+            rows += len(log_pi[0])
+            for i, spec in enumerate(specs):
+                if log_pi[i] is None: continue
+                used = np.isfinite(log_pi[i])
+                stats[i].update(log_pi[i][used])
+                if log_output[i] is not None: output_stats[i].update(log_output[i][used])
+        fits = []
+        for spec, s, out in zip(specs, stats, output_stats):
+            fit = {'formula': spec['formula'], 'quantities': spec['names'], 'exponents': spec['exponents'].tolist(), 'constants': spec['constants'],
+                   'rows': rows, 'rows_used': s.n, 'rows_skipped': rows - s.n}
+            if 'error' in spec: fit['error'] = spec['error']
+            if s.n:
+                std = math.sqrt(s.variance)
+                fit.update({'pi': math.exp(s.mean), 'log_pi_mean': s.mean, 'log_pi_std': std, 'spread': math.exp(std), 'rms_log_residual': std,
+                            'max_abs_log_residual': max(s.max - s.mean, s.mean - s.min),
+                            'r_squared': 1.0 - s.variance / out.variance if out.n and out.variance > 0 else None})
+            else:
+                fit.update({'pi': None, 'log_pi_mean': None, 'log_pi_std': None, 'spread': None, 'rms_log_residual': None, 'max_abs_log_residual': None, 'r_squared': None})
+            fits.append(fit)
+        fits.sort(key=lambda fit: (fit['rms_log_residual'] is None, fit['rms_log_residual'] or 0.0))
+        for rank, fit in enumerate(fits, 1): fit['rank'] = rank
+        return fits
+
+    def _law_spec(self, law) -> Dict:
+        """Normalizes a law to its quantity names, exponent vector and formula."""
+        law = self._to_python_list(law)
+        if isinstance(law, dict):
+            if law.get('exponents') is None or law.get('quantities') is None:
+                raise ValueError("Law has no exponent vector; only successful discoveries (or (names, exponents) pairs) can be fitted.")
+            names, exponents, formula = list(law['quantities']), law['exponents'], law.get('formula')
+        else:
+            names, exponents = law
+            names, formula = list(names), None
+        exponents = np.asarray(exponents, dtype=float)
+        if len(names) != len(exponents): raise ValueError("A law needs one exponent per quantity.")
+        if formula is None and all(name in self._quantities for name in names):
+            formula = self.format_formula([self._quantities[name] for name in names], exponents)
+        return {'names': names, 'exponents': exponents, 'formula': formula, 'constants': {}}
+
+    def _iter_log_pi(self, specs: List[Dict], data, columns: Optional[List[str]], chunk_rows: int, with_output: bool = False):
+        """
+        Streams log Π per law: for each data chunk, a list with one array per
+        spec (NaN where a row is unusable). With with_output it also yields the
+        log of each law's output column (None when the output is a constant).
+        Fills each spec's 'constants' with the typical values it falls back
+        to. A spec that cannot be evaluated gets an 'error' and None in place
+        of its arrays.
+        """
+        available = set(_measurement_columns(data, columns))
+        data_names = list(dict.fromkeys(name for spec in specs for name in spec['names'] if name in available))
+        if not data_names: raise ValueError("None of the laws' quantities has a column in the data.")
+        plans = []
+        for spec in specs:
+            # log Π = log q_0 - Σ e_i log q_i: the output keeps its exponent, the rest flip sign.
+            weights = -spec['exponents']
+            weights[0] = spec['exponents'][0]
+            offset, indices, exps = 0.0, [], []
+            for name, w in zip(spec['names'], weights):
+                if name in available:
+                    indices.append(data_names.index(name)); exps.append(w)
+                    continue
+                q = self._quantities.get(name)
+                value = (q.typical_values or {}).get(self.unit_system.value) if q is not None else None
+                if not value:
+                    spec['error'] = f"'{name}' has no data column and no typical {self.unit_system.value} value."
+                    break
+                spec['constants'][name] = value
+                offset += w * math.log(abs(value))
+            output = data_names.index(spec['names'][0]) if spec['names'][0] in available else None
+            plans.append(None if 'error' in spec else (np.array(indices, dtype=int), np.array(exps, dtype=float), offset, output))
+        for block in _iter_measurement_chunks(data, data_names, columns, chunk_rows):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                logs = np.log(np.abs(block))
+            logs[~np.isfinite(logs)] = np.nan
+            log_pi = [None if plan is None else logs[:, plan[0]] @ plan[1] + plan[2] for plan in plans]
+            if with_output:
+                yield log_pi, [None if plan is None or plan[3] is None else logs[:, plan[3]] for plan in plans]
+            else:
+                yield log_pi
+
+    # --- Service Requests ---
+    REQUEST_OPS = ('discover', 'discover_many', 'quantities', 'cache_info', 'metrics')
+    DISCOVER_FIELDS = ('output_quantity', 'input_quantities', 'constants_to_include', 'auto_search', 'search_limits', 'pi_groups', 'profile')
+
+    def handle_request(self, request: Dict):
+        """
+        Answers one service request (see serve()). request['op'] picks the
+        operation, default 'discover':
+        - 'discover': the discover_relationship arguments as keys;
+        - 'discover_many': {'hypotheses': [...]} as for discover_many;
+        - 'quantities': the library listing, optionally narrowed by 'filter';
+        - 'cache_info': solver cache statistics;
+        - 'metrics': cumulative profiling metrics (self.metrics). Under serve,
+          each worker process keeps its own.
+        Malformed requests raise ValueError.
+        """
+        if not isinstance(request, dict): raise ValueError("Request must be a JSON object.")
+        op = request.get('op', 'discover')
+        if op == 'discover':
+            if not isinstance(request.get('output_quantity'), str): raise ValueError("'discover' needs an 'output_quantity' string.")
+            kwargs = {field: request[field] for field in self.DISCOVER_FIELDS if field in request}
+            kwargs.setdefault('input_quantities', [])
+            self.check_discover_arguments(kwargs)
+            return self.discover_relationship(**kwargs)
+        if op == 'discover_many':
+            if not isinstance(request.get('hypotheses'), list): raise ValueError("'discover_many' needs a 'hypotheses' list.")
+            return self.discover_many(request['hypotheses'])
+        if op == 'quantities':
+            return self.describe_quantities(request.get('filter'))
+        if op == 'cache_info':
+            return self.cache_info()
+        if op == 'metrics':
+            return self.metrics.snapshot()
+        raise ValueError(f"Unknown op '{op}'. Expected one of: {', '.join(self.REQUEST_OPS)}.")
+
+    def describe_quantities(self, name_filter: Optional[str] = None) -> List[Dict]:
+        """Library listing in library order: name, symbol, dimensions and description of each quantity (substring filter on the name)."""
+        needle = (name_filter or '').lower()
+        return [{'name': q.name, 'symbol': q.symbol, 'dimensions': q.dimensions, 'description': q.description}
+                for name, q in self._quantities.items() if needle in name.lower()]
+
+    # --- Law Atlas ---
+    def dimension_classes(self, names: Optional[List[str]] = None) -> List[List[str]]:
+        """Groups quantities (default: the whole library) by identical dimension vector, keeping library order."""
+        library = self._quantities
+        classes = {}
+        for name in (library.names if names is None else names):
+            classes.setdefault(library.row(name).tobytes(), []).append(name)
+        return list(classes.values())
+
+    def iter_atlas_chunk(self, output_class: List[str], candidate_classes: List[List[str]], first: int, max_k: int):
+        """
+        Yields every minimal law for one output dimension class whose first
+        (lowest-index) input class is candidate_classes[first].
+
+        Subsets are grown in index order and the rank is tracked with an
+        IncrementalEchelon. Pruning rules:
+        - A class that does not raise the rank ends the branch, because every
+          superset is underdetermined.
+        - A branch ends when the remaining classes cannot supply a dimension the
+          output needs.
+        - Once a subset solves the output it is not extended, because any
+          extension gives the new input exponent 0.
+        Each record names dimension classes, not single quantities, so aliases
+        such as planck_constant/reduced_planck/action produce one record.
+        """
+        library = self._quantities
+        output_vec = library.row(output_class[0]).tolist()
+        vectors = [library.row(cls[0]).tolist() for cls in candidate_classes]
+        needed = [d for d, power in enumerate(output_vec) if power != 0]
+        # last_cover[d]: highest candidate index that still has dimension d.
+        last_cover = {d: max((j for j, vec in enumerate(vectors) if vec[d] != 0), default=-1) for d in needed}
+        usable = lambda j: not (candidate_classes[j] == output_class and len(output_class) == 1) and any(vectors[j])
+
+        def representative(j):
+            cls = candidate_classes[j]
+            return cls[1] if cls == output_class else cls[0]
+
+        def extend(chosen, echelon, covered, target):
+            target = echelon.reduce(target)
+            if not any(target):
+                record = self._atlas_record(output_class, [candidate_classes[j] for j in chosen], [representative(j) for j in chosen])
+                if record: yield record
+                return
+            if len(chosen) == max_k: return
+            start = chosen[-1] + 1
+            if any(d not in covered and last_cover[d] < start for d in needed): return
+            for j in range(start, len(candidate_classes)):
+                if not usable(j): continue
+                child = echelon.add(vectors[j])
+                if child is None: continue
+                yield from extend(chosen + [j], child, covered | {d for d in needed if vectors[j][d] != 0}, target)
+
+        if first < len(candidate_classes) and usable(first) and any(output_vec):
+            yield from extend([first], IncrementalEchelon().add(vectors[first]), {d for d in needed if vectors[first][d] != 0}, output_vec)
+
+    def _atlas_record(self, output_class: List[str], input_classes: List[List[str]], input_names: List[str]) -> Optional[Dict]:
+        quantities = [self._quantities[output_class[0]]] + [self._quantities[name] for name in input_names]
+        status, exponents, _ = self.solve_and_diagnose(quantities, self.get_all_dimensions(quantities))
+        if status != 'SUCCESS' or any(abs(x) < 1e-10 for x in exponents[1:]): return None
+        return {'output': output_class, 'inputs': input_classes, 'exponents': [float(x) for x in exponents], 'formula': self.format_formula(quantities, exponents)}
+
+    @staticmethod
+    def _read_atlas_checkpoint(checkpoint_path: str, fingerprint: str) -> Tuple[set, int]:
+        """
+        Finished chunks and output offset from a checkpoint log. A torn last
+        line (interrupted write) is ignored and cut off. The log is read and
+        written in binary, so the offsets it is truncated at are byte counts
+        on every platform.
+        """
+        with open(checkpoint_path, 'rb') as f: lines = f.read().split(b'\n')
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            header = {}
+        if header.get('fingerprint') != fingerprint:
+            raise ValueError(f"Checkpoint '{checkpoint_path}' was written for a different library or max_k; remove it to start over.")
+        done, offset, valid = set(), 0, len(lines[0]) + 1
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            done.add(tuple(entry['chunk']))
+            offset = entry['offset']
+            valid += len(line) + 1
+        with open(checkpoint_path, 'r+b') as f: f.truncate(valid)
+        return done, offset
+
+    def enumerate_atlas(self, out_path: str, max_k: int = 3, outputs: Optional[List[str]] = None, candidates: Optional[List[str]] = None, checkpoint_path: Optional[str] = None, processes: Optional[int] = None, progress=None) -> Dict:
+        """
+        Maps every dimensionally unique law in the library: each output
+        dimension class against every subset of at most max_k candidate classes
+        that solve_and_diagnose solves with all exponents nonzero. Records are
+        appended to out_path as JSONL as soon as their chunk finishes, so memory
+        stays flat.
+
+        Work is split into chunks of (output class, first input class). With
+        processes > 1 the chunks run on a multiprocessing pool. After each
+        chunk, one line with the chunk and the byte offset of out_path is
+        appended to the checkpoint_path log. Rerunning with the same arguments
+        truncates any partial output and resumes from there. progress(done, total) is called after
+        each chunk.
+        """
+        if not self.initialized:
+            raise RuntimeError("Engine not initialized. The initialize() method must be called first.")
+        output_classes = [cls for cls in self.dimension_classes(outputs) if self._quantities.row(cls[0]).any()]
+        candidate_classes = self.dimension_classes(candidates)
+        chunks = [(o, j) for o in range(len(output_classes)) for j in range(len(candidate_classes))]
+        fingerprint = hashlib.sha1(json.dumps([max_k, output_classes, candidate_classes, [self._quantities.row(cls[0]).tolist() for cls in candidate_classes]], ensure_ascii=False).encode()).hexdigest()
+
+        done, offset = set(), 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            done, offset = self._read_atlas_checkpoint(checkpoint_path, fingerprint)
+        pending = [chunk for chunk in chunks if chunk not in done]
+        stats = {'output_classes': len(output_classes), 'candidate_classes': len(candidate_classes), 'chunks': len(chunks), 'resumed_chunks': len(done), 'records': 0, 'elapsed': 0.0}
+        start = time.perf_counter()
+
+        mode = 'r+b' if offset and os.path.exists(out_path) else 'wb'
+        with open(out_path, mode) as out, (open(checkpoint_path, 'ab' if done else 'wb') if checkpoint_path else contextlib.nullcontext()) as log:
+            out.seek(offset); out.truncate()
+            if log is not None and not done:
+                log.write((json.dumps({'fingerprint': fingerprint, 'max_k': max_k}) + '\n').encode('utf-8')); log.flush()
+
+            def save_checkpoint(chunk, position):
+                # One appended line per chunk, so a checkpoint costs the same however many chunks are done.
+                if log is None: return
+                log.write((json.dumps({'chunk': list(chunk), 'offset': position}) + '\n').encode('utf-8')); log.flush()
+
+            if processes and processes > 1:
+                import multiprocessing
+                pool = multiprocessing.Pool(processes, initializer=_atlas_worker_init, initargs=(dict(self._quantities), list(BASE_DIMENSIONS), self.worker_settings(), output_classes, candidate_classes, max_k))
+                results = pool.imap_unordered(_atlas_worker_run, pending)
+            else:
+                pool = None
+                results = (((o, j), list(self.iter_atlas_chunk(output_classes[o], candidate_classes, j, max_k))) for o, j in pending)
+            try:
+                for chunk, records in results:
+                    for record in records: out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+                    out.flush()
+                    done.add(chunk)
+                    stats['records'] += len(records)
+                    save_checkpoint(chunk, out.tell())
+                    if progress: progress(len(done), len(chunks))
+            finally:
+                if pool is not None:
+                    pool.terminate(); pool.join()
+        stats['elapsed'] = time.perf_counter() - start
+        return stats
+
+# --- Multiprocessing workers (each process keeps its own warm engine) ---
+_WORKER_ENGINE = None
+_WORKER_ATLAS = None
+
+def _init_worker_engine(library: Dict[str, PhysicalQuantity], dimensions: List[str], settings: Optional[Dict] = None):
+    """Builds this process's engine from the parent's library, dimension order and worker_settings()."""
+    global _WORKER_ENGINE
+    for dim in dimensions: register_dimension(dim)
+    settings = dict(settings or {})
+    search_limits = settings.pop('search_limits', None)
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        _WORKER_ENGINE = EnhancedPhysicsDisentangler(**settings)
+    if search_limits is not None: _WORKER_ENGINE.search_limits = search_limits
+    _WORKER_ENGINE.quantities = library
+    _WORKER_ENGINE.initialized = True
+
+def _atlas_worker_init(library, dimensions, settings, output_classes, candidate_classes, max_k):
+    global _WORKER_ATLAS
+    _init_worker_engine(library, dimensions, settings)
+    _WORKER_ATLAS = (output_classes, candidate_classes, max_k)
+
+def _atlas_worker_run(chunk):
+    output_classes, candidate_classes, max_k = _WORKER_ATLAS
+    o, j = chunk
+    return chunk, list(_WORKER_ENGINE.iter_atlas_chunk(output_classes[o], candidate_classes, j, max_k))
+
+def _discover_many_worker(hypotheses):
+    return _WORKER_ENGINE.discover_many(hypotheses)
+
+def _serve_worker(request):
+    return _WORKER_ENGINE.handle_request(request)
+
+# --- Server Mode ---
+def _json_default(value):
+    if isinstance(value, np.ndarray): return value.tolist()
+    if isinstance(value, np.generic): return value.item()
+    if isinstance(value, Fraction): return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class LawServer:
+    """
+    Long-running service around warm engines, so pipelines can send many
+    queries to one process instead of paying startup per query.
+
+    Requests are JSON objects for EnhancedPhysicsDisentangler.handle_request,
+    plus an optional 'id' echoed back. Each reply is an envelope:
+    {'id', 'ok': True, 'result'} or {'id', 'ok': False, 'error'}.
+
+    workers >= 1 runs that many processes, each with its own initialized
+    engine. workers=0 answers in-process on a single thread. At most
+    max_pending requests are queued or running: stdin stops being read and
+    HTTP connections wait until a slot frees. A request that runs past
+    timeout seconds is answered with an error at once. Its slot stays taken
+    until the worker really finishes, since a running call cannot be
+    interrupted.
+    """
+    HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error', 504: 'Gateway Timeout'}
+    MAX_BODY = 16 * 1024 * 1024
+
+    def __init__(self, engine: 'EnhancedPhysicsDisentangler', workers: int = 1, max_pending: int = 64, timeout: Optional[float] = 30.0):
+        self.engine = engine
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self._executor = None
+        self._slots = None
+        self.stats = {'requests': 0, 'errors': 0, 'timeouts': 0}
+
+    def start(self):
+        """Creates the worker pool. Called by the serve_* coroutines inside the running event loop."""
+        if self._executor is not None: return
+        import asyncio, concurrent.futures
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if self.workers >= 1:
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker_engine, initargs=(dict(self.engine.quantities), list(BASE_DIMENSIONS), self.engine.worker_settings()))
+            self._call = _serve_worker
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(1)
+            self._call = self.engine.handle_request
+
+    def close(self):
+        if self._executor is not None: self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+    async def handle(self, request) -> Tuple[int, Dict]:
+        """Runs one request on the pool. Returns (HTTP status, reply envelope); waits for a free slot first."""
+        await self._slots.acquire()
+        return await self._run(request)
+
+    async def _run(self, request) -> Tuple[int, Dict]:
+        """handle() for a caller that already holds a slot; the slot is released when the work ends."""
+        import asyncio
+        request_id = request.get('id') if isinstance(request, dict) else None
+        self.stats['requests'] += 1
+        try:
+            future = self._executor.submit(self._call, request)
+        except Exception:
+            self._slots.release()
+            raise
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+        try:
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return 504, {'id': request_id, 'ok': False, 'error': f"Request timed out after {self.timeout:g} s."}
+        except ValueError as e:
+            self.stats['errors'] += 1
+            return 400, {'id': request_id, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            self.stats['errors'] += 1
+            return 500, {'id': request_id, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        return 200, {'id': request_id, 'ok': True, 'result': result}
+
+    @staticmethod
+    def encode(reply: Dict) -> bytes:
+        return json.dumps(reply, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+    async def serve_stdio(self, stdin=None, stdout=None):
+        """
+        JSONL over stdin/stdout: one request per input line, one reply per
+        output line. Replies are written as they finish, not in input order;
+        match them by 'id'. Returns at end of input once every reply is out.
+        """
+        import asyncio
+        self.start()
+        stdin, stdout = stdin or sys.stdin.buffer, stdout or sys.stdout.buffer
+        loop = asyncio.get_running_loop()
+        pending = set()
+
+        async def answer(request):
+            _, reply = await self._run(request)
+            stdout.write(self.encode(reply) + b'\n')
+            stdout.flush()
+
+        while True:
+            line = await loop.run_in_executor(None, stdin.readline)
+            if not line: break
+            if not line.strip(): continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                stdout.write(self.encode({'id': None, 'ok': False, 'error': f"Invalid JSON: {e}"}) + b'\n')
+                stdout.flush()
+                continue
+            # Input is not read again until a slot is free.
+            await self._slots.acquire()
+            task = asyncio.ensure_future(answer(request))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending: await asyncio.gather(*pending)
+
+    async def serve_http(self, host: str = '127.0.0.1', port: int = 8765, ready=None):
+        """
+        Minimal HTTP/1.1 endpoint with keep-alive. Routes:
+        - POST / or /discover, /discover_many, /quantities: JSON request body;
+          the path sets the default op.
+        - GET /quantities[?filter=...] and GET /health.
+        The reply envelope is the body, with status 400 for a bad request, 504
+        for a timeout and 500 for an engine error.
+        """
+        import asyncio
+        from urllib.parse import urlsplit, parse_qs
+        server_stats = self.stats
+
+        async def respond(writer, status, reply, keep_alive):
+            body = self.encode(reply)
+            head = f"HTTP/1.1 {status} {self.HTTP_REASONS.get(status, '')}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+
+        async def connection(reader, writer):
+            try:
+                while True:
+                    request_line = await reader.readline()
+                    if not request_line.strip(): break
+                    try:
+                        method, target, version = request_line.decode('latin-1').split()
+                    except ValueError:
+                        await respond(writer, 400, {'id': None, 'ok': False, 'error': "Malformed request line."}, False)
+                        break
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b'\r\n', b'\n', b''): break
+                        key, _, value = line.decode('latin-1').partition(':')
+                        headers[key.strip().lower()] = value.strip()
+                    connection_header = headers.get('connection', '').lower()
+                    keep_alive = connection_header != 'close' if version == 'HTTP/1.1' else connection_header == 'keep-alive'
+                    length = int(headers.get('content-length') or 0)
+                    if length > self.MAX_BODY:
+                        await respond(writer, 413, {'id': None, 'ok': False, 'error': "Request body too large."}, False)
+                        break
+                    body = await reader.readexactly(length) if length else b''
+                    url = urlsplit(target)
+                    route = url.path.strip('/') or 'discover'
+                    if route == 'health':
+                        status, reply = 200, {'id': None, 'ok': True, 'result': dict(server_stats, workers=self.workers, max_pending=self.max_pending)}
+                    elif route not in self.engine.REQUEST_OPS:
+                        status, reply = 404, {'id': None, 'ok': False, 'error': f"Unknown path '{url.path}'."}
+                    elif method == 'GET' and route == 'quantities':
+                        query = parse_qs(url.query)
+                        status, reply = await self.handle({'op': 'quantities', 'filter': query.get('filter', [None])[0]})
+                    elif method != 'POST':
+                        status, reply = 405, {'id': None, 'ok': False, 'error': f"{method} is not supported on '{url.path}'."}
+                    else:
+                        try:
+                            request = json.loads(body or b'{}')
+                        except ValueError as e:
+                            request = None
+                            status, reply = 400, {'id': None, 'ok': False, 'error': f"Invalid JSON: {e}"}
+                        if request is not None:
+                            if isinstance(request, dict): request.setdefault('op', route)
+                            status, reply = await self.handle(request)
+                    await respond(writer, status, reply, keep_alive)
+                    if not keep_alive: break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                writer.close()
+
+        self.start()
+        server = await asyncio.start_server(connection, host, port)
+        if ready: ready(server.sockets[0].getsockname())
+        async with server:
+            await server.serve_forever()
+
+# --- Command Line ---
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Physics law discovery engine.")
+    parser.add_argument('--library', action='append', default=[], help="Extra .json/.csv/.qlib library merged over the built-in one (repeatable)")
+    commands = parser.add_subparsers(dest='command')
+    compile_lib = commands.add_parser('compile-library', help="Merge library files into one precompiled .qlib (or .json/.csv) file.")
+    compile_lib.add_argument('sources', nargs='*', help="Library files, merged left to right")
+    compile_lib.add_argument('--out', required=True, help="Output file; the format is chosen by extension")
+    compile_lib.add_argument('--no-builtin', action='store_true', help="Do not include the built-in library")
+    atlas = commands.add_parser('atlas', help="Enumerate every dimensionally unique law in the library to JSONL.")
+    atlas.add_argument('--out', default='atlas.jsonl', help="JSONL output file (default: atlas.jsonl)")
+    atlas.add_argument('--max-k', type=int, default=3, help="Largest number of inputs/constants per law (default: 3)")
+    atlas.add_argument('--outputs', help="Comma-separated output quantities (default: whole library)")
+    atlas.add_argument('--candidates', help="Comma-separated input/constant candidates (default: whole library)")
+    atlas.add_argument('--checkpoint', help="Checkpoint file; rerun with the same file to resume")
+    atlas.add_argument('--processes', type=int, default=os.cpu_count(), help="Worker processes (default: CPU count, 1 = no pool)")
+    serve = commands.add_parser('serve', help="Answer JSON requests from warm engines, as JSONL on stdin/stdout or over local HTTP.")
+    serve.add_argument('--http', metavar='[HOST:]PORT', help="Listen for HTTP on this address instead of reading stdin")
+    serve.add_argument('--workers', type=int, default=1, help="Engine worker processes (default: 1, 0 = in-process)")
+    serve.add_argument('--max-pending', type=int, default=64, help="Requests queued or running before input is throttled (default: 64)")
+    serve.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds, 0 = none (default: 30)")
+    fit = commands.add_parser('fit', help="Discover a law and fit its constant Π to measurement data.")
+    fit.add_argument('output', help="Output quantity")
+    fit.add_argument('inputs', nargs='*', help="Input quantities")
+    fit.add_argument('--constants', help="Comma-separated constants to include")
+    fit.add_argument('--auto-search', action='store_true', help="Let auto-search add constants and rank its top solutions against the data")
+    fit.add_argument('--data', required=True, help="Measurements as .csv (header row of quantity names) or .npy")
+    fit.add_argument('--columns', help="Comma-separated column names, for .npy files or CSV files without a header")
+    fit.add_argument('--chunk-rows', type=int, default=FIT_CHUNK_ROWS, help=f"Rows per streamed chunk (default: {FIT_CHUNK_ROWS})")
+    fit.add_argument('--residuals', help="Write the best law's per-row log residuals to this .npy file")
+    args = parser.parse_args(argv)
+
+    # serve and fit write JSON to stdout, so their status lines go to stderr.
+    status = sys.stderr if args.command in ('serve', 'fit') else sys.stdout
+    with contextlib.redirect_stdout(status):
+        engine = EnhancedPhysicsDisentangler()
+        print("Initializing engine for command-line use...")
+        engine.initialize(library_paths=args.library)
+        print("Engine ready.\n")
+
+    if args.command == 'compile-library':
+        libraries = ([] if args.no_builtin else [engine.quantities]) + [load_quantity_library(path) for path in args.sources]
+        merged = merge_quantity_libraries(*libraries)
+        save_quantity_library(merged, args.out)
+        print(f"Wrote {len(merged)} quantities to {args.out}.")
+        return
+
+    if args.command == 'atlas':
+        split = lambda value: [name.strip() for name in value.split(',') if name.strip()] if value else None
+        report = lambda done, total: (done == total or done % max(1, total // 100) == 0) and print(f"\rAtlas: {done}/{total} chunks", end='', file=sys.stderr, flush=True)
+        stats = engine.enumerate_atlas(args.out, max_k=args.max_k, outputs=split(args.outputs), candidates=split(args.candidates), checkpoint_path=args.checkpoint, processes=args.processes, progress=report)
+        print(file=sys.stderr)
+        print(json.dumps(stats, indent=2))
+        return
+
+    if args.command == 'fit':
+        split = lambda value: [name.strip() for name in value.split(',') if name.strip()] if value else None
+        result = engine.discover_relationship(args.output, args.inputs, split(args.constants), auto_search=args.auto_search)
+        if not result['success'] or 'exponents' not in result:
+            print(result['message'])
+            sys.exit(1)
+        columns = split(args.columns)
+        fits = engine.rank_laws(result, args.data, columns=columns, chunk_rows=args.chunk_rows)
+        if args.residuals and 'error' not in fits[0]:
+            fits[0] = dict(engine.fit_law(fits[0], args.data, columns=columns, chunk_rows=args.chunk_rows, residuals=args.residuals), rank=1)
+        print(json.dumps(fits, indent=2, ensure_ascii=False))
+        return
+
+    if args.command == 'serve':
+        import asyncio
+        server = LawServer(engine, workers=args.workers, max_pending=args.max_pending, timeout=args.timeout)
+        try:
+            if args.http:
+                host, _, port = args.http.rpartition(':')
+                announce = lambda address: print(f"Serving on http://{address[0]}:{address[1]}/ ({args.workers} worker(s))", file=sys.stderr, flush=True)
+                asyncio.run(server.serve_http(host or '127.0.0.1', int(port), ready=announce))
+            else:
+                asyncio.run(server.serve_stdio())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return
     # You would need to create an async main loop to use interactive_discovery here
     # For now, this just confirms the class can be initialized.
     print("To run interactively, you would need an async runner.")
+
+# This block is for command-line use and will not run in the browser.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+# law_discovery_bench.py
+#
+# Command-line benchmark suite for the discovery engine. Times the main stages
+# (solve_and_diagnose, _get_suggestions, format_formula, auto-search and
+# end-to-end discover_relationship) on the built-in library and on synthetic
+# libraries of growing size and dimension count. It writes JSON with
+# percentiles and peak memory, and can flag regressions against a stored
+# baseline run.
+#
+#   python law_discovery_bench.py --out bench.json
+#   python law_discovery_bench.py --quick --baseline bench.json
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import law_discovery as ld
+
+# Inputs per hypothesis, and the search limits used for the auto-search case.
+# Only node limits apply, so every run does the same work.
+HYPOTHESIS_SIZES = (1, 2, 4, 6)
+SEARCH_LIMITS = {'max_depth': 3, 'max_nodes': 200, 'time_budget': None, 'top_k': 3}
+EXPONENT_CHOICES = (-2.0, -1.5, -1.0, -0.5, 0.5, 1.0, 1.5, 2.0, 3.0)
+PROFILES = {
+    'full': {'sizes': (100, 1000, 10000), 'dims': (6, 8, 10), 'hypotheses': 200, 'search_hypotheses': 10, 'memory_calls': 50, 'repeats': 5},
+    'quick': {'sizes': (100, 1000), 'dims': (6, 10), 'hypotheses': 40, 'search_hypotheses': 3, 'memory_calls': 10, 'repeats': 5},
+}
+# Metrics compared against a baseline, and the smallest absolute change that
+# counts (so microsecond jitter on tiny cases is not reported). The tail
+# percentiles are recorded but too noisy on small samples to gate on. Time
+# metrics are scaled by the machine-speed calibration before comparing.
+COMPARED_METRICS = {'p50_us': 5.0, 'peak_kib': 64.0}
+TIME_METRICS = ('p50_us',)
+# Timed runs per case at least, over all its calls and passes: cases with few
+# calls (auto-search, library builds) run each call more often per pass.
+MIN_RUNS_PER_CASE = 60
+
+
+def synthetic_library(size: int, n_dims: int, seed: int = 0) -> Dict[str, ld.PhysicalQuantity]:
+    """
+    size quantities over n_dims base dimensions (the 6 SI ones, then X6, X7,
+    ... registered as needed). Each quantity has 1-4 nonzero exponents in
+    [-3, 3], weighted toward small powers like real quantities.
+    """
+    dims = list(ld.BASE_DIMENSIONS[:6]) + [f"X{i}" for i in range(6, n_dims)]
+    for dim in dims: ld.register_dimension(dim)
+    rng = random.Random(seed * 1_000_003 + size * 31 + n_dims)
+    powers, weights = (-3, -2, -1, 1, 2, 3), (1, 3, 6, 6, 3, 1)
+    library = {}
+    for i in range(size):
+        chosen = rng.sample(dims, rng.randint(1, min(4, n_dims)))
+        dimensions = {dim: rng.choices(powers, weights)[0] for dim in chosen}
+        name = f"q{i:05d}"
+        library[name] = ld.PhysicalQuantity(name, f"q{i}", dimensions, description=f"Synthetic quantity {i}")
+    return library
+
+
+def hypotheses(names: Sequence[str], n_inputs: int, count: int, rng: random.Random) -> List[List[str]]:
+    """count random hypotheses of the form [output, *inputs] with distinct names."""
+    return [rng.sample(names, n_inputs + 1) for _ in range(count)]
+
+
+def quiet_engine(library: Optional[Dict[str, ld.PhysicalQuantity]] = None, cache_size: int = 0) -> ld.EnhancedPhysicsDisentangler:
+    """Engine with the solver cache off by default, so repeated signatures are re-solved and timed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = ld.EnhancedPhysicsDisentangler(cache_size=cache_size)
+        if library is None:
+            engine.initialize()
+        else:
+            engine.quantities = library
+            engine.initialized = True
+    return engine
+
+
+def calibration_workload():
+    """Fixed engine-independent work (integer, float and dict operations) that tracks the machine's current speed."""
+    table = {}
+    total = 0.0
+    for i in range(2000):
+        table[i % 97] = table.get(i % 97, 0) + i * i
+        total += math.sqrt(i)
+    return total + sum(table.values())
+
+
+def peak_memory(calls: List[Callable[[], object]]) -> float:
+    """Peak traced allocation in KiB while running calls, measured apart from the timing passes, which tracemalloc would slow down."""
+    tracemalloc.start()
+    for call in calls: call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def measure(cases: Dict[str, List[Callable[[], object]]], memory_calls: int, repeats: int = 5, progress: Callable[[str], None] = lambda key: None) -> Dict[str, Dict]:
+    """
+    Times every case and returns its statistics, keyed like cases.
+
+    Each call runs once to warm up (lazy imports, interned names, allocator
+    pools). Then every call of every case is timed repeats times, with the
+    garbage collector off (more often for cases with few calls, see
+    MIN_RUNS_PER_CASE), and keeps its fastest time, as timeit does:
+    scheduler and GC noise only ever add time. Each pass runs the calls of
+    all cases in a new shuffled order, so a call's runs land at scattered
+    moments and a slow phase of the machine cannot hit every run of a case.
+    A fixed calibration workload is mixed in the same way and reported as
+    the 'calibration' case, which compare() uses to factor out the speed of
+    the machine. The first memory_calls calls of each case are then rerun
+    under tracemalloc for the peak allocation.
+    """
+    for key, calls in cases.items():
+        progress(f"{key} (warm-up)")
+        for call in calls: call()
+    cases = dict(cases, calibration=[calibration_workload] * 20)
+    best = {key: np.full(len(calls), np.inf) for key, calls in cases.items()}
+    order = [(key, i) for key, calls in cases.items() for i in range(len(calls))
+             for _ in range(-(-MIN_RUNS_PER_CASE // (len(calls) * max(1, repeats))))]
+    rng = random.Random(0)
+    gc_was_enabled = gc.isenabled()
+    for run in range(max(1, repeats)):
+        progress(f"timing run {run + 1}/{max(1, repeats)}")
+        rng.shuffle(order)
+        gc.disable()
+        try:
+            for key, i in order:
+                start = time.perf_counter()
+                cases[key][i]()
+                elapsed = time.perf_counter() - start
+                if elapsed < best[key][i]: best[key][i] = elapsed
+        finally:
+            if gc_was_enabled: gc.enable()
+    results = {}
+    for key, calls in cases.items():
+        us = best[key] * 1e6
+        results[key] = {
+            'calls': len(calls),
+            'repeats': max(1, repeats),
+            'mean_us': float(us.mean()),
+            'p50_us': float(np.percentile(us, 50)),
+            'p90_us': float(np.percentile(us, 90)),
+            'p99_us': float(np.percentile(us, 99)),
+            'max_us': float(us.max()),
+            'total_s': float(best[key].sum()),
+            'peak_kib': peak_memory(calls[:memory_calls]) if key != 'calibration' else 0.0,
+        }
+    return results
+
+
+def library_cases(label: str, engine: ld.EnhancedPhysicsDisentangler, settings: Dict, seed: int) -> Dict[str, List[Callable[[], object]]]:
+    """Every case for one library, as lists of calls. Keys are '<library>/<case>/k=<inputs>'."""
+    cases = {}
+    names = list(engine.quantities)
+    rng = random.Random(seed)
+    for k in HYPOTHESIS_SIZES:
+        if k + 1 > len(names): continue
+        sample = [[engine.quantities[name] for name in hyp] for hyp in hypotheses(names, k, settings['hypotheses'], rng)]
+        dims = [engine.get_all_dimensions(qs) for qs in sample]
+        missing = []
+        for qs in sample:
+            present = {dim for q in qs[1:] for dim in q.dimensions}
+            missing.append({dim: power for dim, power in qs[0].dimensions.items() if dim not in present} or None)
+        exponents = [np.array([1.0] + [rng.choice(EXPONENT_CHOICES) for _ in qs[1:]]) for qs in sample]
+        cases.update({
+            f"{label}/solve_and_diagnose/k={k}": [lambda qs=qs, d=d: engine.solve_and_diagnose(qs, d) for qs, d in zip(sample, dims)],
+            f"{label}/get_suggestions/k={k}": [lambda qs=qs, m=m: engine._get_suggestions(qs, missing_dims=m) for qs, m in zip(sample, missing)],
+            f"{label}/format_formula/k={k}": [lambda qs=qs, e=e: engine.format_formula(qs, e) for qs, e in zip(sample, exponents)],
+            f"{label}/discover_relationship/k={k}": [lambda qs=qs: engine.discover_relationship(qs[0].name, [q.name for q in qs[1:]]) for qs in sample],
+            f"{label}/auto_search/k={k}": [lambda qs=qs: engine.discover_relationship(qs[0].name, [q.name for q in qs[1:]], auto_search=True, search_limits=SEARCH_LIMITS)
+                                           for qs in sample[:settings['search_hypotheses']]],
+        })
+    return cases
+
+
+def run(settings: Dict, seed: int = 0, include_builtin: bool = True, progress: Callable[[str], None] = lambda key: None) -> Dict:
+    """Runs the whole suite and returns the JSON-ready report."""
+    cases = {}
+    if include_builtin:
+        cases.update(library_cases('builtin', quiet_engine(), settings, seed))
+    for n_dims in settings['dims']:
+        for size in settings['sizes']:
+            label = f"synthetic-{size}x{n_dims}d"
+            library = synthetic_library(size, n_dims, seed)
+            cases[f"{label}/build_library"] = [lambda library=library: ld.QuantityLibrary(library)] * 5
+            cases.update(library_cases(label, quiet_engine(library), settings, seed))
+    results = measure(cases, settings['memory_calls'], settings['repeats'], progress)
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'seed': seed,
+            'settings': {key: list(value) if isinstance(value, tuple) else value for key, value in settings.items()},
+            'hypothesis_sizes': list(HYPOTHESIS_SIZES),
+            'search_limits': SEARCH_LIMITS,
+        },
+        'results': results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """
+    Regressions of report against baseline: a metric in COMPARED_METRICS that
+    grew by more than threshold (a fraction) and by more than its minimum
+    absolute change. Time metrics are first divided by the speed factor
+    (see speed_factor), so a machine that is uniformly slower than when the
+    baseline was recorded does not count. Cases missing from either run are
+    skipped.
+    """
+    regressions = []
+    factor = speed_factor(report, baseline)
+    for key, current in report['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous or key == 'calibration': continue
+        for metric, min_delta in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None: continue
+            if metric in TIME_METRICS: new = new / factor
+            if new > old * (1 + threshold) and new - old > min_delta:
+                regressions.append({'case': key, 'metric': metric, 'baseline': old, 'current': new, 'ratio': new / old if old else float('inf')})
+    return regressions
+
+
+def speed_factor(report: Dict, baseline: Dict) -> float:
+    """How much slower the machine ran the calibration workload than for the baseline (1.0 if either run lacks it)."""
+    current = report['results'].get('calibration', {}).get('p50_us')
+    previous = baseline.get('results', {}).get('calibration', {}).get('p50_us')
+    return current / previous if current and previous else 1.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the physics law discovery engine.")
+    parser.add_argument('--quick', action='store_true', help="Smaller libraries and fewer hypotheses")
+    parser.add_argument('--sizes', help="Comma-separated synthetic library sizes (default: 100,1000,10000)")
+    parser.add_argument('--dims', help="Comma-separated base-dimension counts, 6-10 (default: 6,8,10)")
+    parser.add_argument('--hypotheses', type=int, help="Hypotheses per case and size (default: 200)")
+    parser.add_argument('--repeats', type=int, help="Timed runs per call after a warm-up run; the fastest counts (default: 5)")
+    parser.add_argument('--no-builtin', action='store_true', help="Skip the built-in library")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for libraries and hypotheses (default: 0)")
+    parser.add_argument('--out', help="Write the JSON report here (default: stdout)")
+    parser.add_argument('--baseline', help="Earlier JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.4, help="Relative slowdown that counts as a regression (default: 0.4)")
+    args = parser.parse_args(argv)
+
+    settings = dict(PROFILES['quick' if args.quick else 'full'])
+    parse_ints = lambda value: tuple(int(v) for v in value.split(',') if v.strip())
+    if args.sizes: settings['sizes'] = parse_ints(args.sizes)
+    if args.dims: settings['dims'] = parse_ints(args.dims)
+    if args.hypotheses: settings['hypotheses'] = args.hypotheses
+    if args.repeats: settings['repeats'] = args.repeats
+    if any(not 6 <= d <= 10 for d in settings['dims']): parser.error("--dims values must be between 6 and 10")
+
+    report = run(settings, seed=args.seed, include_builtin=not args.no_builtin, progress=lambda key: print(f"  {key}", file=sys.stderr, flush=True))
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f: baseline = json.load(f)
+        report['speed_factor'] = speed_factor(report, baseline)
+        report['regressions'] = regressions = compare(report, baseline, args.threshold)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f: f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        print(f"\nCalibration ran x{report['speed_factor']:.2f} as long as for the baseline; times are scaled by it.", file=sys.stderr)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} against {args.baseline}:", file=sys.stderr)
+            for r in sorted(regressions, key=lambda r: -r['ratio']):
+                print(f"  {r['case']:<55} {r['metric']:<8} {r['baseline']:>12.1f} -> {r['current']:>12.1f}  (x{r['ratio']:.2f})", file=sys.stderr)
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,41 @@
-# law_discovery.py 
+# law_discovery.py
+#
+# Echo stand-in for the engine, for testing the worker.js <-> Python bridge
+# without the real solver: serve it as law_discovery.py. It implements the
+# calls worker.js makes (initialize, quantities, discover_steps,
+# describe_quantities) and echoes the request back as the formula.
 
 import numpy
-import sympy
 import json
 
-print("Python: FINAL ECHO TEST SCRIPT LOADED (v3).")
+print("Python: FINAL ECHO TEST SCRIPT LOADED (v4).")
 
 class EnhancedPhysicsDisentangler:
     def __init__(self):
         self.initialized = False
+        self.quantities = {}
         print("Python: FAKE __init__ called.")
 
     def initialize(self):
         print("Python: FAKE synchronous initialize() method was called.")
+        self.quantities = {name: {'name': name, 'symbol': name[0], 'dimensions': {}, 'description': "Echo test quantity"} for name in ('energy', 'mass', 'velocity')}
         self.initialized = True
         print("Python: FAKE initialization complete.")
 
-    def discover_relationship(self, output_quantity: str, input_quantities: list, constants_to_include: list, auto_search: bool, verbose: bool) -> dict:
+    def describe_quantities(self, name_filter=None) -> list:
+        needle = (name_filter or '').lower()
+        return [q for name, q in self.quantities.items() if needle in name.lower()]
+
+    def discover_steps(self, output_quantity: str, input_quantities: list, constants_to_include: list = None, auto_search: bool = False, verbose: bool = False, **kwargs):
+        print("Python: FAKE discover_steps called.")
+        if auto_search:
+            yield {'event': 'progress', 'stage': 'auto_search', 'nodes_expanded': 0, 'trying': []}
+        yield {'event': 'result', 'result': self.discover_relationship(output_quantity, input_quantities, constants_to_include, auto_search, verbose)}
+
+    def discover_relationship(self, output_quantity: str, input_quantities: list, constants_to_include: list = None, auto_search: bool = False, verbose: bool = False, **kwargs) -> dict:
         print("Python: FAKE discover_relationship called.")
-        
+
         if not self.initialized:
-            # THIS IS THE PART I FORGOT THE FUCKING RETURN STATEMENT ON
             return {
                 'success': False,
                 'message': "INTERNAL TEST ERROR: The engine was not initialized. The 'initialize()' method was never called by the JavaScript."
@@ -28,7 +43,7 @@ class EnhancedPhysicsDisentangler:
 
         inputs_str = ", ".join(input_quantities) if input_quantities else "None"
         constants_str = ", ".join(constants_to_include) if constants_to_include else "None"
-        
+
         formula_str = (
             f"ECHO SUCCESS:\n"
             f"  - Output: '{output_quantity}'\n"
@@ -36,7 +51,7 @@ class EnhancedPhysicsDisentangler:
             f"  - Constants: [{constants_str}]\n"
             f"  - Auto-Search: {auto_search}"
         )
-        
+
         return {
             'success': True,
             'formula': formula_str,
@@ -47,4 +62,4 @@ class EnhancedPhysicsDisentangler:
             }
         }
 
-print("Python: FAKE class (v3) has been defined.")
+print("Python: FAKE class (v4) has been defined.")
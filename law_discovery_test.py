@@ -0,0 +1,333 @@
+# Tests for law_discovery.py. Run with: python -m pytest -q
+
+import asyncio
+import contextlib
+import io
+import itertools
+import math
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from law_discovery import (EnhancedPhysicsDisentangler, LawServer, PhysicalQuantity, exact_solve, exact_solve_many, conflicting_row, integer_null_space,
+                           load_quantity_library, merge_quantity_libraries, save_quantity_library)
+
+
+def make_engine(**kwargs) -> EnhancedPhysicsDisentangler:
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine = EnhancedPhysicsDisentangler(**kwargs)
+        engine.initialize()
+    return engine
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return make_engine()
+
+
+def diagnose(engine, output, inputs):
+    quantities = [engine.quantities[name] for name in [output] + inputs]
+    return engine.solve_and_diagnose(quantities, engine.get_all_dimensions(quantities))
+
+
+# --- solve_and_diagnose (user-001) ---
+
+def test_unique_solution(engine):
+    status, exponents, message = diagnose(engine, 'energy', ['mass', 'speed_of_light'])
+    assert status == 'SUCCESS'
+    assert exponents.tolist() == [1.0, 1.0, 2.0]
+    assert message == "Unique dimensionless relationship found."
+
+def test_missing_dimensions(engine):
+    status, exponents, message = diagnose(engine, 'mass', ['length'])
+    assert status == 'FAIL_INCONSISTENT' and exponents is None
+    assert message == ("Hypothesis is impossible. Inputs are missing required dimensions.\n"
+                       "       Reason: Output requires 'M', not present in inputs.\n"
+                       "       Suggestion: Try adding: electron_mass, proton_mass, i_mass, density")
+
+def test_inconsistent_names_conflicting_dimension(engine):
+    status, _, message = diagnose(engine, 'wavelength', ['fine_structure', 'elementary_charge', 'planck_constant'])
+    assert status == 'FAIL_INCONSISTENT'
+    assert "Reason: The equation for 'L' cannot be satisfied." in message
+
+def test_underdetermined(engine):
+    status, _, message = diagnose(engine, 'force', ['mass', 'acceleration', 'velocity', 'time'])
+    assert status == 'FAIL_UNDERDETERMINED'
+    assert message.startswith("Hypothesis is underdetermined. Infinite solutions exist.\n       Reason: 2 dimensionless groups can be formed.")
+
+def test_insufficient_vars(engine):
+    assert diagnose(engine, 'energy', []) == ('FAIL_INSUFFICIENT_VARS', None, "Hypothesis requires at least 2 quantities.")
+
+def test_conflicting_row_blames_removable_equation():
+    # x = 1 (row 0) against x = 0 twice (rows 1, 2): only dropping row 0 is consistent.
+    assert conflicting_row([[1], [1], [1]], [1, 0, 0]) == 0
+    assert exact_solve([[1], [1], [1]], [1, 0, 0])[1] == 0
+
+def test_exact_solver_keeps_half_integer_exponents():
+    # statcoulomb = M^1/2 L^3/2 T^-1 against mass, length, time (rows L, M, T).
+    assert exact_solve([[0, 1, 0], [1, 0, 0], [0, 0, 1]], [1.5, 0.5, -1]) == (3, None, [Fraction(1, 2), Fraction(3, 2), Fraction(-1)])
+    assert exact_solve([[1], [1]], [0.5, 1])[1] is not None
+
+def test_crosscheck_backend_agrees():
+    pytest.importorskip('sympy')
+    engine = make_engine(solver_backend='crosscheck')
+    for output, inputs in [('energy', ['mass', 'speed_of_light']), ('wavelength', ['fine_structure', 'elementary_charge', 'planck_constant']),
+                           ('force', ['mass', 'acceleration', 'velocity', 'time'])]:
+        assert diagnose(engine, output, inputs)[0] != 'FAIL_SOLVER'
+
+
+# --- Solver result cache (user-002) ---
+
+def test_cache_shared_by_aliases():
+    engine = make_engine()
+    engine.discover_relationship('energy', ['mass', 'speed_of_light'])
+    engine.discover_relationship('energy', ['electron_mass', 'velocity'])
+    info = engine.cache_info()
+    assert info['misses'] == 1 and info['hits'] == 1 and info['size'] == 1
+
+def test_cache_invalidated_by_library_changes():
+    engine = make_engine()
+    assert engine.discover_relationship('energy', ['mass', 'speed_of_light'])['success']
+    engine.add_quantity(PhysicalQuantity('speed_of_light', 'c', {'L': 2, 'T': -1}))
+    assert engine.cache_info()['size'] == 0
+    assert not engine.discover_relationship('energy', ['mass', 'speed_of_light'])['success']
+
+def test_cache_invalidated_by_direct_mutation():
+    engine = make_engine()
+    assert engine.discover_relationship('energy', ['mass', 'speed_of_light'])['success']
+    # Writing to the library itself bypasses add_quantity; the version check still catches it.
+    engine.quantities['speed_of_light'] = PhysicalQuantity('speed_of_light', 'c', {'L': 2, 'T': -1})
+    assert not engine.discover_relationship('energy', ['mass', 'speed_of_light'])['success']
+    engine.remove_quantity('speed_of_light')
+    assert 'Unknown quantity' in engine.discover_relationship('energy', ['mass', 'speed_of_light'])['message']
+
+
+# --- Auto-search (user-003) ---
+
+def test_search_keeps_every_user_input(engine):
+    result = engine.discover_relationship('energy', ['temperature'], auto_search=True)
+    assert result['success'] and result['added_constants'] == ['boltzmann_constant']
+    for solution in result['solutions']:
+        assert all(x != 0 for x in solution['exponents'])
+
+def test_search_rejects_laws_without_an_input(engine):
+    # Every library quantity with L alone would give mass exponent 0.
+    result = engine.discover_relationship('wavelength', ['mass'], auto_search=True)
+    assert not result['success']
+
+
+# --- Law atlas (user-005) ---
+
+def test_atlas_resumes_from_checkpoint(engine, tmp_path):
+    full = tmp_path / 'full.jsonl'
+    engine.enumerate_atlas(str(full), max_k=2, processes=1)
+
+    class Interrupt(Exception): pass
+    def stop_halfway(done, total):
+        if done == total // 2: raise Interrupt
+    out, checkpoint = tmp_path / 'atlas.jsonl', str(tmp_path / 'atlas.ckpt')
+    with pytest.raises(Interrupt):
+        engine.enumerate_atlas(str(out), max_k=2, checkpoint_path=checkpoint, processes=1, progress=stop_halfway)
+    with open(checkpoint, 'rb') as f: log = f.read()
+    with open(checkpoint, 'wb') as f: f.write(log.replace(b'\n', b'\r\n') + b'{"chunk": [0,')   # Windows line ends, then a torn write
+    stats = engine.enumerate_atlas(str(out), max_k=2, checkpoint_path=checkpoint, processes=1)
+    assert stats['resumed_chunks'] == stats['chunks'] // 2
+    assert out.read_text(encoding='utf-8') == full.read_text(encoding='utf-8')
+    # The truncated log is still whole: a rerun finds every chunk done.
+    assert engine.enumerate_atlas(str(out), max_k=2, checkpoint_path=checkpoint, processes=1)['resumed_chunks'] == stats['chunks']
+
+
+# --- Buckingham-Pi groups (user-006) ---
+
+def lattice_index(basis):
+    """gcd of the maximal minors: 1 exactly when the basis spans every integer vector of its span."""
+    matrix = np.array(basis)
+    return math.gcd(*(int(round(np.linalg.det(matrix[:, cols]))) for cols in itertools.combinations(range(matrix.shape[1]), len(basis))))
+
+def test_pi_groups_span_the_integer_null_space(engine):
+    quantities = [engine.quantities[name] for name in ['area', 'length', 'volume']]
+    groups = [group['exponents'] for group in engine.buckingham_pi_groups(quantities)]
+    assert len(groups) == 2 and lattice_index(groups) == 1
+    # area·length/volume is one of the groups (and must at least be reachable from them).
+    assert [1, 1, -1] in groups
+
+def test_integer_null_space_is_saturated():
+    rows = [[2, 1, 3, 0], [0, 2, 0, 4]]
+    basis = integer_null_space(rows)
+    assert len(basis) == 2 and lattice_index(basis) == 1
+    assert all(sum(a * x for a, x in zip(row, vec)) == 0 for row in rows for vec in basis)
+
+
+# --- Library files (user-007) ---
+
+def library_snapshot(library):
+    return {name: (q.symbol, q.dims, q.typical_values, q.description) for name, q in library.items()}
+
+@pytest.mark.parametrize('extension', ['.json', '.csv', '.qlib'])
+def test_library_round_trip(engine, tmp_path, extension):
+    path = str(tmp_path / f'library{extension}')
+    save_quantity_library(engine.quantities, path)
+    loaded = load_quantity_library(path)
+    assert library_snapshot(loaded) == library_snapshot(engine.quantities)
+    assert loaded.names == engine.quantities.names
+    assert loaded.lookup({'L': 1, 'T': -1}) == engine.quantities.lookup({'L': 1, 'T': -1})
+
+@pytest.mark.parametrize('extension, text', [
+    ('.json', '{"quantities": [{"name": "statcoulomb", "symbol": "esu", "dimensions": {"M": 0.5, "L": 1.5, "T": -1}}]}'),
+    ('.csv', 'name,symbol,description,L,M,T\nstatcoulomb,esu,,1.5,0.5,-1\n'),
+])
+def test_library_rejects_non_integer_exponents(tmp_path, extension, text):
+    path = tmp_path / f'library{extension}'
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(ValueError, match="is not an integer"):
+        load_quantity_library(str(path))
+
+def test_quantity_dimensions_must_be_integers():
+    with pytest.raises(ValueError, match="is not an integer"):
+        PhysicalQuantity('statcoulomb', 'esu', {'M': 0.5, 'L': 1.5, 'T': -1})
+    assert PhysicalQuantity('area', 'A', {'L': 2.0}).dims == (2,)
+
+def test_compiled_library_is_memory_mapped(engine, tmp_path):
+    path = str(tmp_path / 'library.qlib')
+    save_quantity_library(engine.quantities, path)
+    loaded = load_quantity_library(path)
+    assert isinstance(loaded._matrix, np.memmap)
+    loaded['velocity'] = PhysicalQuantity('velocity', 'v', {'L': 2})   # copy on write, file untouched
+    assert loaded.row('velocity').tolist()[:1] == [2]
+    assert load_quantity_library(path).row('velocity').tolist()[:3] == [1, 0, -1]
+
+
+def test_initialize_keeps_compiled_library_memory_mapped(engine, tmp_path):
+    path = str(tmp_path / 'library.qlib')
+    save_quantity_library(merge_quantity_libraries(engine.quantities, {'jerk': PhysicalQuantity('jerk', 'j', {'L': 1, 'T': -3})}), path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = EnhancedPhysicsDisentangler()
+        loaded.initialize(library_paths=[path])
+    assert isinstance(loaded.quantities._matrix, np.memmap)
+    assert loaded.quantities.names == engine.quantities.names + ['jerk']
+    assert loaded.quantities.lookup({'L': 1, 'T': -3}) == ['jerk']
+
+def test_merge_resolves_conflicts_in_bulk(engine):
+    light = PhysicalQuantity('speed_of_light', 'c0', {'L': 1, 'T': -1})
+    extra = {'speed_of_light': light, 'jerk': PhysicalQuantity('jerk', 'j', {'L': 1, 'T': -3})}
+    merged = merge_quantity_libraries(engine.quantities, extra)
+    assert merged['speed_of_light'].symbol == 'c0' and merged.names[-1] == 'jerk'
+    assert merge_quantity_libraries(engine.quantities, extra, on_conflict='keep')['speed_of_light'].symbol == 'c'
+    with pytest.raises(ValueError):
+        merge_quantity_libraries(engine.quantities, extra, on_conflict='error')
+    # Same names and dimensions: the matrix is reused, but never shared with a live library.
+    same = merge_quantity_libraries(engine.quantities, {'speed_of_light': light})
+    assert not np.shares_memory(same._matrix, engine.quantities._matrix)
+    assert same.lookup({'L': 1, 'T': -1}) == engine.quantities.lookup({'L': 1, 'T': -1})
+
+
+# --- Batch discovery (user-008) ---
+
+def test_discover_many_matches_a_loop(engine):
+    hypotheses = [('energy', ['mass', 'speed_of_light']), ('energy', ['mass']), ('force', ['mass', 'acceleration', 'velocity', 'time']),
+                  ('energy', ['mass', 'speed_of_light']), {'output_quantity': 'energy', 'input_quantities': ['temperature'], 'auto_search': True},
+                  ('wavelength', ['fine_structure', 'elementary_charge', 'planck_constant']), ('momentum', ['electron_mass', 'velocity'])]
+    expected = [engine.discover_relationship(**engine._hypothesis_kwargs(h)) for h in hypotheses]
+    for result in expected: result.get('search_stats', {}).pop('elapsed', None)
+    results = engine.discover_many(hypotheses)
+    for result in results: result.get('search_stats', {}).pop('elapsed', None)
+    assert results == expected
+
+@pytest.mark.parametrize('options', [{}, {'solver_backend': 'crosscheck'}, {'profiling': True}])
+def test_discover_many_matches_a_loop_on_random_hypotheses(options):
+    if options.get('solver_backend'): pytest.importorskip('sympy')
+    engine, rng = make_engine(**options), np.random.default_rng(0)
+    names = list(engine.quantities)
+    hypotheses = [{'output_quantity': str(rng.choice(names)), 'input_quantities': [str(name) for name in rng.choice(names, rng.integers(0, 5), replace=False)],
+                   'pi_groups': bool(rng.random() < 0.8)} for _ in range(400)]
+    expected = [engine.discover_relationship(**h) for h in hypotheses]
+    engine.clear_cache()
+    results = engine.discover_many(hypotheses)
+    if options.get('profiling'):
+        for result in expected + results: result.pop('profile')
+    assert results == expected
+
+def test_discover_many_workers_use_the_engine_settings():
+    engine = make_engine()
+    engine.search_limits['top_k'] = 1
+    hypotheses = [{'output_quantity': 'energy', 'input_quantities': ['mass'], 'auto_search': True}] * 3
+    for result in engine.discover_many(hypotheses, processes=2, chunk_size=2):
+        assert result['success'] and len(result['solutions']) == 1
+
+def test_exact_solve_many_matches_exact_solve():
+    rng = np.random.default_rng(1)
+    systems = []
+    for _ in range(2000):
+        n_rows, n_inputs = rng.integers(1, 7), rng.integers(1, 6)
+        systems.append((rng.choice([0, 0, 0, 1, -1, 2, -2, 3], (n_rows, n_inputs)).tolist(), rng.choice([0, 1, -1, 2], n_rows).tolist()))
+    systems.append(([[2**40, 3], [7, 1]], [1, 2]))   # too large for the int64 stack
+    assert exact_solve_many(systems) == [exact_solve(A, b) for A, b in systems]
+
+def test_discover_many_isolates_bad_hypotheses(engine):
+    results = engine.discover_many([('energy', ['mass', 'speed_of_light']), {'output_quantity': 'energy', 'inputs': ['mass']},
+                                    {'output_quantity': 'energy', 'input_quantities': 'mass'}, 'energy', ('nonsense', ['mass'])])
+    assert results[0]['success']
+    assert results[1] == {'success': False, 'message': "Invalid hypothesis: Unknown argument(s): inputs."}
+    assert "'input_quantities' must be a list" in results[2]['message']
+    assert results[3]['message'].startswith("Invalid hypothesis:")
+    assert 'Unknown quantity' in results[4]['message']
+
+
+# --- Service requests (user-009) ---
+
+@pytest.mark.parametrize('request_body, error', [
+    ({'output_quantity': 'energy', 'input_quantities': 'mass'}, "'input_quantities' must be a list of quantity names."),
+    ({'output_quantity': 'energy', 'input_quantities': ['mass'], 'constants_to_include': [1]}, "'constants_to_include' must be a list of quantity names."),
+    ({'output_quantity': 'energy', 'input_quantities': ['mass'], 'search_limits': {'depth': 2}}, "Unknown search limit(s): depth. Expected: max_depth, max_nodes, time_budget, top_k."),
+    ({'output_quantity': 'energy', 'input_quantities': ['mass'], 'search_limits': {'max_depth': '2'}}, "Search limit 'max_depth' must be a number."),
+])
+def test_handle_request_rejects_malformed_arguments(engine, request_body, error):
+    with pytest.raises(ValueError) as excinfo:
+        engine.handle_request(request_body)
+    assert str(excinfo.value) == error
+
+def test_handle_request_discover(engine):
+    result = engine.handle_request({'output_quantity': 'energy', 'input_quantities': ['mass'], 'auto_search': True, 'search_limits': {'top_k': 1}})
+    assert result['success'] and len(result['solutions']) == 1
+
+def test_server_workers_use_the_engine_settings():
+    engine = make_engine()
+    engine.search_limits['top_k'] = 1
+    server = LawServer(engine, workers=1)
+
+    async def ask():
+        server.start()
+        try:
+            return await server.handle({'id': 7, 'output_quantity': 'energy', 'input_quantities': ['mass'], 'auto_search': True})
+        finally:
+            server.close()
+    status, reply = asyncio.run(ask())
+    assert status == 200 and reply['id'] == 7 and len(reply['result']['solutions']) == 1
+
+
+# --- Fitting laws to data (user-013) ---
+
+def kinetic_energy_data(rows=2000, noise=0.01):
+    rng = np.random.default_rng(0)
+    mass, velocity = rng.uniform(0.1, 10, rows), rng.uniform(1, 100, rows)
+    return {'energy': 0.5 * mass * velocity**2 * np.exp(rng.normal(0, noise, rows)), 'mass': mass, 'velocity': velocity}
+
+def test_fit_law_recovers_the_constant(engine):
+    fit = engine.fit_law((['energy', 'mass', 'velocity'], [1, 1, 2]), kinetic_energy_data())
+    assert fit['pi'] == pytest.approx(0.5, rel=1e-3)
+    assert fit['rms_log_residual'] == pytest.approx(0.01, rel=0.1)
+    assert fit['r_squared'] > 0.999 and fit['rows_used'] == fit['rows'] == 2000
+
+def test_fit_law_skips_unusable_rows_and_streams_chunks(engine):
+    data = kinetic_energy_data(rows=1000)
+    data['mass'][:10] = 0.0
+    fit = engine.fit_law((['energy', 'mass', 'velocity'], [1, 1, 2]), data, chunk_rows=64, residuals=True)
+    assert fit['rows_skipped'] == 10 and np.isnan(fit['residuals'][:10]).all()
+    assert np.nanstd(fit['residuals']) == pytest.approx(fit['log_pi_std'])
+
+def test_rank_laws_prefers_the_true_law(engine):
+    laws = [(['energy', 'mass', 'velocity'], [1, 1, 1]), (['energy', 'mass', 'velocity'], [1, 1, 2])]
+    fits = engine.rank_laws(laws, kinetic_energy_data())
+    assert [fit['exponents'] for fit in fits] == [[1.0, 1.0, 2.0], [1.0, 1.0, 1.0]]
+    assert [fit['rank'] for fit in fits] == [1, 2]
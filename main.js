@@ -1,46 +1,85 @@
 // main.js (This is the correct version. Use this.)
+// The engine runs in worker.js, so loading and long auto-searches never block the page.
 
-async function setupPyodide() {
+const engineWorker = new Worker('worker.js');
+const pendingRequests = new Map();  // id -> {resolve, reject, onProgress}
+let nextRequestId = 1;
+let runningDiscoveryId = null;
+
+// With cross-origin isolation, a shared interrupt buffer lets Cancel stop
+// Python mid-computation. Otherwise cancellation takes effect at the next
+// progress event.
+const interruptBuffer = (self.crossOriginIsolated && typeof SharedArrayBuffer !== 'undefined')
+    ? new Int32Array(new SharedArrayBuffer(4)) : null;
+
+const engineReadyPromise = new Promise((resolve) => {
     const outputDiv = document.getElementById('output');
     outputDiv.innerHTML = '<p class="status-loading">Initializing Python Environment...</p>';
-    try {
-        let pyodide = await loadPyodide();
-        
-        outputDiv.innerHTML = '<p class="status-loading">Loading Scientific Libraries (NumPy, SymPy)...</p>';
-        await pyodide.loadPackage(["numpy", "sympy"]);
+    engineWorker.onmessage = ({ data: message }) => {
+        if (message.type === 'status') {
+            outputDiv.innerHTML = `<p class="status-loading">${message.message}</p>`;
+        } else if (message.type === 'ready') {
+            outputDiv.innerHTML = '<p class="status-ready">✅ Environment Ready. Please define a hypothesis.</p>';
+            console.log(`Physics Disentangler engine is ready (${message.count} quantities).`);
+            resolve(true);
+        } else if (message.type === 'error' && message.id === null) {
+            outputDiv.innerHTML = `<p class="status-error">CRITICAL ERROR during initialization. Check console. The error is: ${message.message}</p>`;
+            resolve(false);
+        } else {
+            settleRequest(message);
+        }
+    };
+    engineWorker.onerror = (error) => {
+        console.error("A critical error occurred in the engine worker:", error);
+        outputDiv.innerHTML = `<p class="status-error">CRITICAL ERROR during initialization. Check console. The error is: ${error.message}</p>`;
+        resolve(false);
+    };
+    engineWorker.postMessage({ type: 'init', interruptBuffer: interruptBuffer && interruptBuffer.buffer });
+});
 
-        outputDiv.innerHTML = '<p class="status-loading">Loading Physics Disentangler Engine...</p>';
-        
-        const cacheBuster = '?v=' + new Date().getTime();
-        const pythonCode = await (await fetch('./law_discovery.py' + cacheBuster)).text();
-        
-        await pyodide.runPythonAsync(pythonCode);
-        
-        pyodide.runPython("engine = EnhancedPhysicsDisentangler()");
-        const engine = pyodide.globals.get('engine');
-        engine.initialize();
-        
-        outputDiv.innerHTML = '<p class="status-ready">✅ Environment Ready. Please define a hypothesis.</p>';
-        console.log("Physics Disentangler engine is ready.");
-        
-        return pyodide;
-    } catch (error) {
-        console.error("A critical error occurred during initialization:", error);
-        outputDiv.innerHTML = `<p class="status-error">CRITICAL ERROR during initialization. Check console. The error is: ${error}</p>`;
+function settleRequest(message) {
+    const request = pendingRequests.get(message.id);
+    if (!request) return;
+    if (message.type === 'progress') {
+        if (request.onProgress) request.onProgress(message.event);
+        return;
     }
+    pendingRequests.delete(message.id);
+    if (message.type === 'result') request.resolve(message.result);
+    else if (message.type === 'cancelled') request.resolve(null);
+    else request.reject(new Error(message.message));
+}
+
+// Sends a request to the worker. Resolves with the result, or null if cancelled.
+function requestEngine(type, payload = {}, onProgress = null) {
+    const id = nextRequestId++;
+    const promise = new Promise((resolve, reject) => pendingRequests.set(id, { resolve, reject, onProgress }));
+    engineWorker.postMessage({ type, id, ...payload });
+    return { id, promise };
+}
+
+function cancelDiscovery() {
+    if (runningDiscoveryId === null) return;
+    engineWorker.postMessage({ type: 'cancel', id: runningDiscoveryId });
+    if (interruptBuffer) interruptBuffer[0] = 2;  // SIGINT: raises KeyboardInterrupt inside Python
+    document.getElementById('cancelButton').disabled = true;
 }
 
-let pyodideReadyPromise = setupPyodide();
+function describeProgress(event) {
+    if (event.event === 'solution') return `Found: ${event.formula}`;
+    const trying = event.trying.length ? ` (trying ${event.trying.join(', ')})` : '';
+    return `Auto-searching... ${event.nodes_expanded} states expanded, ${event.solutions_found} solution(s) so far${trying}`;
+}
 
 async function runDiscovery() {
     const discoverButton = document.getElementById('discoverButton');
+    const cancelButton = document.getElementById('cancelButton');
     const outputDiv = document.getElementById('output');
 
     discoverButton.disabled = true;
     outputDiv.innerHTML = '<p class="status-loading">Disentangling...</p>';
 
-    let pyodide = await pyodideReadyPromise;
-    if (!pyodide) {
+    if (!(await engineReadyPromise)) {
         outputDiv.innerHTML = '<p class="status-error">Initialization failed. Please refresh the page.</p>';
         discoverButton.disabled = false;
         return;
@@ -54,24 +93,26 @@ async function runDiscovery() {
     const input_quantities = input_quantities_str.split(',').map(s => s.trim()).filter(Boolean);
     const constants_to_include = constants_str.split(',').map(s => s.trim()).filter(Boolean);
 
+    const { id, promise } = requestEngine(
+        'discover',
+        { args: { output_quantity, input_quantities, constants_to_include, auto_search } },
+        (event) => { outputDiv.innerHTML = `<p class="status-loading">${describeProgress(event)}</p>`; }
+    );
+    runningDiscoveryId = id;
+    cancelButton.disabled = false;
     try {
-        const engine = pyodide.globals.get('engine');
-        const resultProxy = engine.discover_relationship(
-            output_quantity,
-            input_quantities,
-            constants_to_include,
-            auto_search,
-            true
-        );
-        
-        const result = resultProxy.toJs({ dict_converter: Object.fromEntries });
-        
-        displayResult(result);
-
+        const result = await promise;
+        if (result === null) {
+            outputDiv.innerHTML = '<p class="status-ready">Discovery cancelled.</p>';
+        } else {
+            displayResult(result);
+        }
     } catch (error) {
-        outputDiv.innerHTML = `<p class="status-error">An error occurred during discovery:<br>${error}</p>`;
+        outputDiv.innerHTML = `<p class="status-error">An error occurred during discovery:<br>${error.message}</p>`;
         console.error(error);
     } finally {
+        runningDiscoveryId = null;
+        cancelButton.disabled = true;
         discoverButton.disabled = false;
     }
 }
@@ -108,35 +149,41 @@ function displayResult(result) {
 
 document.addEventListener('DOMContentLoaded', function() {
     document.getElementById('discoverButton').addEventListener('click', runDiscovery);
+    document.getElementById('cancelButton').addEventListener('click', cancelDiscovery);
     const modal = document.getElementById("quantitiesModal");
     const link = document.getElementById("showQuantitiesLink");
     const closeButton = modal.querySelector(".close-button");
+    let quantitiesPromise = null;
     if (link && modal && closeButton) {
         link.onclick = async function(event) {
             event.preventDefault();
-            let pyodide = await pyodideReadyPromise;
-            if(pyodide) {
-                const engine = pyodide.globals.get('engine');
-                if (engine && typeof engine.quantities !== 'undefined') {
-                    // This part is safe because the echo test doesn't have quantities, it will just be empty.
-                    const quantities = (typeof engine.quantities.toJs === 'function') ? engine.quantities.toJs({ dict_converter: Object.fromEntries }) : {};
-                    const listElement = document.getElementById('quantityList');
-                    const searchInput = document.getElementById('quantitySearch');
-                    const renderList = (filter = '') => {
-                        listElement.innerHTML = '';
-                        Object.keys(quantities).sort().forEach(key => {
-                            if (key.toLowerCase().includes(filter.toLowerCase())) {
-                               const li = document.createElement('li');
-                               li.textContent = key;
-                               listElement.appendChild(li);
-                            }
-                        });
-                    };
-                    searchInput.onkeyup = () => renderList(searchInput.value);
-                    renderList();
-                }
-            }
             modal.style.display = "block";
+            if (!(await engineReadyPromise)) return;
+            // The library does not change while the page is open, so it is requested once.
+            quantitiesPromise = quantitiesPromise || requestEngine('quantities').promise;
+            let quantities;
+            try {
+                quantities = await quantitiesPromise;
+            } catch (error) {
+                console.error(error);
+                quantitiesPromise = null;
+                return;
+            }
+            const listElement = document.getElementById('quantityList');
+            const searchInput = document.getElementById('quantitySearch');
+            const names = quantities.map(q => q.name).sort();
+            const renderList = (filter = '') => {
+                listElement.innerHTML = '';
+                names.forEach(key => {
+                    if (key.toLowerCase().includes(filter.toLowerCase())) {
+                       const li = document.createElement('li');
+                       li.textContent = key;
+                       listElement.appendChild(li);
+                    }
+                });
+            };
+            searchInput.onkeyup = () => renderList(searchInput.value);
+            renderList(searchInput.value);
         }
         closeButton.onclick = function() { modal.style.display = "none"; }
         window.onclick = function(event) {
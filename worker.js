@@ -0,0 +1,154 @@
+// worker.js: hosts Pyodide and the physics engine off the page's UI thread.
+//
+// Messages from the page:
+//   {type: 'init', interruptBuffer?}  load Pyodide and the engine (sent once)
+//   {type: 'discover', id, args}      args: output_quantity, input_quantities, constants_to_include, auto_search
+//   {type: 'quantities', id}          list the quantity library
+//   {type: 'cancel', id}              stop a queued or running discovery
+// Messages to the page:
+//   {type: 'status', message}         loading progress
+//   {type: 'ready', count}            engine initialized with `count` quantities
+//   {type: 'progress', id, event}     auto-search progress / solution events
+//   {type: 'result', id, result}      final discovery result or quantity list
+//   {type: 'cancelled', id}
+//   {type: 'error', id, message}      id is null for initialization errors
+
+const PYODIDE_VERSION = 'v0.25.1';
+
+importScripts(`https://cdn.jsdelivr.net/pyodide/${PYODIDE_VERSION}/full/pyodide.js`);
+
+let pyodide = null;
+let engine = null;
+let interruptBuffer = null;
+let queue = Promise.resolve();
+const cancelled = new Set();
+
+// Yields to the worker's event loop so queued 'cancel' messages get handled.
+// A MessageChannel round trip avoids the 4 ms clamp of nested setTimeout calls.
+const resumeChannel = new MessageChannel();
+const resumeQueue = [];
+resumeChannel.port1.onmessage = () => resumeQueue.shift()();
+const yieldToEventLoop = () => new Promise(resolve => {
+    resumeQueue.push(resolve);
+    resumeChannel.port2.postMessage(null);
+});
+
+// The engine source is revalidated on every load ({cache: 'no-cache'} sends a
+// conditional request, answered 304 while the file is unchanged), so an edited
+// law_discovery.py is never served stale and there is no version to bump.
+async function fetchEngineSource() {
+    const response = await fetch('./law_discovery.py', { cache: 'no-cache' });
+    if (!response.ok) throw new Error(`HTTP ${response.status} while fetching law_discovery.py`);
+    dropVersionedEngineCaches();
+    return await response.text();
+}
+
+// Earlier builds kept the engine in per-version Cache Storage entries; remove them.
+async function dropVersionedEngineCaches() {
+    try {
+        for (const key of await caches.keys()) {
+            if (key.startsWith('law-discovery-')) await caches.delete(key);
+        }
+    } catch (error) {
+        // Cache Storage is unavailable on some origins (file://, private windows); nothing to clean up.
+    }
+}
+
+async function initialize(message) {
+    // Pyodide and NumPy come from the CDN with long-lived cache headers, so
+    // the browser's HTTP cache serves them on reload.
+    postMessage({ type: 'status', message: 'Initializing Python Environment...' });
+    pyodide = await loadPyodide();
+    if (message.interruptBuffer) {
+        interruptBuffer = new Int32Array(message.interruptBuffer);
+        pyodide.setInterruptBuffer(interruptBuffer);
+    }
+
+    // The engine solves with its own exact rational solver, so SymPy is not loaded.
+    postMessage({ type: 'status', message: 'Loading Scientific Libraries (NumPy)...' });
+    await pyodide.loadPackage(["numpy"]);
+
+    postMessage({ type: 'status', message: 'Loading Physics Disentangler Engine...' });
+    await pyodide.runPythonAsync(await fetchEngineSource());
+    pyodide.runPython("engine = EnhancedPhysicsDisentangler()");
+    engine = pyodide.globals.get('engine');
+    engine.initialize();
+    postMessage({ type: 'ready', count: pyodide.runPython("len(engine.quantities)") });
+}
+
+function toJs(proxy) {
+    const value = proxy.toJs({ dict_converter: Object.fromEntries });
+    proxy.destroy();
+    return value;
+}
+
+async function discover(id, args) {
+    const steps = engine.discover_steps(
+        args.output_quantity,
+        args.input_quantities || [],
+        args.constants_to_include || [],
+        !!args.auto_search,
+        true
+    );
+    try {
+        while (true) {
+            if (cancelled.has(id)) {
+                steps.close();
+                postMessage({ type: 'cancelled', id });
+                return;
+            }
+            const { done, value } = steps.next();
+            if (done) return;
+            const event = toJs(value);
+            if (event.event === 'result') {
+                postMessage({ type: 'result', id, result: event.result });
+                return;
+            }
+            postMessage({ type: 'progress', id, event });
+            await yieldToEventLoop();
+        }
+    } catch (error) {
+        if (String(error).includes('KeyboardInterrupt')) postMessage({ type: 'cancelled', id });
+        else throw error;
+    } finally {
+        steps.destroy();
+    }
+}
+
+async function handle(message) {
+    const { type, id } = message;
+    if (cancelled.delete(id)) {
+        postMessage({ type: 'cancelled', id });
+        return;
+    }
+    // Clear an interrupt that arrived after the previous request had already finished.
+    if (interruptBuffer) interruptBuffer[0] = 0;
+    try {
+        if (type === 'discover') {
+            await discover(id, message.args);
+        } else if (type === 'quantities') {
+            postMessage({ type: 'result', id, result: toJs(engine.describe_quantities()) });
+        } else {
+            throw new Error(`Unknown request type '${type}'`);
+        }
+    } catch (error) {
+        console.error(error);
+        postMessage({ type: 'error', id, message: String(error) });
+    } finally {
+        cancelled.delete(id);
+    }
+}
+
+onmessage = ({ data: message }) => {
+    if (message.type === 'init') {
+        queue = queue.then(() => initialize(message)).catch(error => {
+            console.error("A critical error occurred during initialization:", error);
+            postMessage({ type: 'error', id: null, message: String(error) });
+        });
+    } else if (message.type === 'cancel') {
+        cancelled.add(message.id);
+    } else {
+        // Requests run one at a time, in arrival order.
+        queue = queue.then(() => handle(message));
+    }
+};